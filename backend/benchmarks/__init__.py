@@ -0,0 +1,10 @@
+"""
+Offline benchmark suite for ingest, search and chat.
+
+Runs against a throw-away test database with deterministic stub Whisper and
+embedding backends and a local fake OpenAI streaming server, so it needs no
+models, GPU or network. Results are JSON and can be compared across commits:
+
+    python -m benchmarks run --scale small --out bench-head.json
+    python -m benchmarks compare bench-base.json bench-head.json
+"""
@@ -0,0 +1,119 @@
+from __future__ import annotations
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+
+def _ints(value: str):
+    return [int(x) for x in value.split(",") if x.strip()]
+
+
+def run(args) -> int:
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "server.settings")
+    os.environ["DISABLE_MODEL_WARMUP"] = "true"
+    # Stub models only; never reach for the real ones or the network
+    os.environ["ALLOW_MODEL_DOWNLOADS"] = "false"
+    import django
+
+    django.setup()
+    from django.db import connection
+    from django.test.utils import override_settings, setup_databases, setup_test_environment, teardown_databases
+
+    from .harness import Results, environment
+    from .suites import SCALES, SUITES
+
+    opts = dict(SCALES[args.scale])
+    if args.segments:
+        opts["segments"] = _ints(args.segments)
+    if args.videos:
+        opts["videos"] = _ints(args.videos)
+    if args.repeat:
+        opts["repeat"] = args.repeat
+    opts["dim"] = args.dim
+    opts["seed"] = args.seed
+    suites = args.suite or list(SUITES)
+
+    setup_test_environment()
+    # A throw-away test database (test_<name>), never the configured one
+    old_config = setup_databases(verbosity=0, interactive=False)
+    results = Results({
+        **environment(),
+        "database": connection.vendor,
+        "scale": args.scale,
+        "suites": suites,
+        "options": opts,
+        "started_at": time.time(),
+    })
+    try:
+        # VECTOR_SHARD_DIR is derived from MEDIA_ROOT once at startup, so it is redirected too
+        with tempfile.TemporaryDirectory(prefix="scenequery-bench-") as tmp, override_settings(
+            MEDIA_ROOT=os.path.join(tmp, "media"),
+            PIPELINE_CHECKPOINT_DIR=os.path.join(tmp, "checkpoints"),
+            VECTOR_SHARD_DIR=os.path.join(tmp, "shards"),
+        ):
+            for name in suites:
+                SUITES[name](results, opts)
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+    if args.out:
+        results.save(args.out)
+        print(f"Wrote {len(results.results)} results to {args.out}")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="Run benchmark suites and write JSON results")
+    p.add_argument("--suite", action="append", choices=("ingest", "search", "chat"), help="Repeatable; default all")
+    p.add_argument("--scale", choices=("smoke", "small", "large"), default="small")
+    p.add_argument("--segments", help="Comma-separated segments per video, overrides the scale")
+    p.add_argument("--videos", help="Comma-separated videos in the database, overrides the scale")
+    p.add_argument("--repeat", type=int, help="Timed runs per benchmark")
+    p.add_argument("--dim", type=int, default=384, help="Embedding dimension")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--out", help="JSON results file")
+
+    c = sub.add_parser("compare", help="Compare two results files; exits 1 on regressions")
+    c.add_argument("base")
+    c.add_argument("head")
+    c.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown (0.10 = 10%%)")
+    c.add_argument("--stat", choices=("median", "min", "mean", "p95"), default="median")
+
+    lt = sub.add_parser("loadtest", help="Concurrent WebSocket load test of the chat and progress consumers")
+    lt.add_argument("--url", help="ws://host:port of a running server; default drives the ASGI app in-process")
+    lt.add_argument("--video", type=int, help="Indexed video id on the --url server")
+    lt.add_argument("--chat", type=int, default=200, help="Concurrent chat sockets")
+    lt.add_argument("--progress", type=int, default=200, help="Concurrent progress sockets")
+    lt.add_argument("--questions", type=int, default=3, help="Questions per chat socket")
+    lt.add_argument("--cancel-ratio", type=float, default=0.2, help="Share of questions canceled mid-stream")
+    lt.add_argument("--think", type=float, default=0.5, help="Mean seconds between questions")
+    lt.add_argument("--ramp", type=float, default=5.0, help="Seconds over which sockets are opened")
+    lt.add_argument("--hold", type=float, default=10.0, help="Seconds to hold progress sockets when --chat 0")
+    lt.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for any single message")
+    lt.add_argument("--progress-interval", type=float, default=0.25, help="In-process only: seconds between published progress events")
+    lt.add_argument("--tokens", type=int, default=100, help="In-process only: tokens per fake LLM answer")
+    lt.add_argument("--llm-ttft", type=float, default=0.2, help="In-process only: fake LLM seconds to first token")
+    lt.add_argument("--llm-interval", type=float, default=0.01, help="In-process only: fake LLM seconds between tokens")
+    lt.add_argument("--dim", type=int, default=384)
+    lt.add_argument("--seed", type=int, default=0)
+    lt.add_argument("--out", help="JSON report file")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        return run(args)
+    if args.command == "loadtest":
+        from .loadtest import main as loadtest
+
+        return loadtest(args)
+    from .harness import compare
+
+    return 1 if compare(args.base, args.head, args.threshold, args.stat) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
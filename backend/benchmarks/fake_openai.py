@@ -0,0 +1,121 @@
+from __future__ import annotations
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Load tests open hundreds of streams at once; the socketserver default backlog is 5
+    request_queue_size = 1024
+
+
+class FakeOpenAIServer:
+    """
+    Local stand-in for the OpenAI chat completions API that streams `tokens`
+    SSE chunks, after `ttft_sec`, one every `token_interval_sec`. Point the
+    openai client at it with OPENAI_BASE_URL=<server.base_url>.
+    """
+
+    def __init__(self, tokens: int = 200, ttft_sec: float = 0.0, token_interval_sec: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.tokens = tokens
+        self.ttft_sec = ttft_sec
+        self.token_interval_sec = token_interval_sec
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                server.requests += 1
+                model = body.get("model", "fake")
+                if not body.get("stream"):
+                    text = " ".join(f"tok{i}" for i in range(server.tokens))
+                    payload = json.dumps({
+                        "id": "chatcmpl-bench", "object": "chat.completion", "created": 0, "model": model,
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    }).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+
+                def chunk(delta, finish=None):
+                    data = {
+                        "id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": 0, "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                    }
+                    self.wfile.write(b"data: " + json.dumps(data).encode("utf-8") + b"\n\n")
+                    self.wfile.flush()
+
+                try:
+                    chunk({"role": "assistant", "content": ""})
+                    if server.ttft_sec:
+                        time.sleep(server.ttft_sec)
+                    for i in range(server.tokens):
+                        if i and server.token_interval_sec:
+                            time.sleep(server.token_interval_sec)
+                        chunk({"content": f" tok{i}"})
+                    chunk({}, "stop")
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client canceled
+
+        self.httpd = _Server((host, port), Handler)
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake streaming OpenAI chat completions API")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--ttft", type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument("--interval", type=float, default=0.02, help="Seconds between tokens")
+    args = parser.parse_args()
+    server = FakeOpenAIServer(args.tokens, args.ttft, args.interval, port=args.port)
+    print(f"Fake OpenAI API on {server.base_url} (set OPENAI_BASE_URL to this and any OPENAI_API_KEY)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
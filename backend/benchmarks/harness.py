@@ -0,0 +1,123 @@
+from __future__ import annotations
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=Path(__file__).resolve().parent, timeout=5
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def environment() -> Dict:
+    import numpy as np
+
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+
+
+def summarize(samples: List[float]) -> Dict:
+    s = sorted(samples)
+    return {
+        "n": len(s),
+        "min": s[0],
+        "median": statistics.median(s),
+        "mean": statistics.fmean(s),
+        "p95": s[min(len(s) - 1, int(round(0.95 * (len(s) - 1))))],
+        "stdev": statistics.stdev(s) if len(s) > 1 else 0.0,
+    }
+
+
+class Results:
+    def __init__(self, meta: Dict):
+        self.meta = meta
+        self.results: List[Dict] = []
+
+    def add(self, name: str, params: Dict, samples: List[float], extra: Optional[Dict] = None, unit: str = "s") -> Dict:
+        rec = {"name": name, "params": params, "unit": unit, **summarize(samples)}
+        if extra:
+            rec["extra"] = extra
+        self.results.append(rec)
+        shown = " ".join(f"{k}={v}" for k, v in params.items())
+        more = " ".join(f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}" for k, v in (extra or {}).items())
+        print(f"  {name:<22} {shown:<32} median={rec['median'] * 1000:10.3f} ms  min={rec['min'] * 1000:10.3f} ms  {more}")
+        return rec
+
+    def time(
+        self,
+        name: str,
+        params: Dict,
+        fn: Callable[[], object],
+        repeat: int = 5,
+        warmup: int = 1,
+        setup: Optional[Callable[[], object]] = None,
+        extra: Optional[Callable[[List[float]], Dict]] = None,
+    ) -> Dict:
+        """Run fn warmup + repeat times (setup, if given, runs untimed before each call)."""
+        samples: List[float] = []
+        for i in range(warmup + repeat):
+            if setup is not None:
+                setup()
+            t0 = time.perf_counter()
+            fn()
+            dt = time.perf_counter() - t0
+            if i >= warmup:
+                samples.append(dt)
+        return self.add(name, params, samples, extra(samples) if extra else None)
+
+    def as_dict(self) -> Dict:
+        return {"meta": self.meta, "results": self.results}
+
+    def save(self, path: str | Path) -> None:
+        Path(path).write_text(json.dumps(self.as_dict(), indent=2), encoding="utf-8")
+
+
+def _key(rec: Dict) -> str:
+    return rec["name"] + "[" + ",".join(f"{k}={rec['params'][k]}" for k in sorted(rec["params"])) + "]"
+
+
+def compare(base_path: str, head_path: str, threshold: float = 0.10, stat: str = "median") -> int:
+    """
+    Print head vs base per benchmark and return the number of regressions, i.e.
+    benchmarks whose `stat` got slower by more than `threshold` (0.10 = 10%).
+    """
+    base = json.loads(Path(base_path).read_text(encoding="utf-8"))
+    head = json.loads(Path(head_path).read_text(encoding="utf-8"))
+    base_by_key = {_key(r): r for r in base["results"]}
+    print(f"base {base['meta'].get('commit') or base_path}  head {head['meta'].get('commit') or head_path}  ({stat})")
+    regressions = 0
+    for rec in head["results"]:
+        key = _key(rec)
+        old = base_by_key.pop(key, None)
+        if old is None:
+            print(f"  {key:<64} {'new':>10}")
+            continue
+        ratio = rec[stat] / old[stat] if old[stat] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        print(f"  {key:<64} {old[stat] * 1000:10.3f} -> {rec[stat] * 1000:10.3f} ms  x{ratio:5.2f}{flag}")
+    for key in base_by_key:
+        print(f"  {key:<64} {'removed':>10}")
+    print(f"{regressions} regression(s) over {threshold:.0%}", file=sys.stderr if regressions else sys.stdout)
+    return regressions
@@ -0,0 +1,330 @@
+from __future__ import annotations
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from .wsclient import ConnectionClosed, WebSocketClient
+
+
+def percentiles(values: List[float]) -> Dict:
+    if not values:
+        return {"n": 0}
+    s = sorted(values)
+
+    def pct(p: float) -> float:
+        return s[min(len(s) - 1, int(round(p * (len(s) - 1))))]
+
+    return {"n": len(s), "p50": pct(0.50), "p90": pct(0.90), "p99": pct(0.99), "max": s[-1], "mean": sum(s) / len(s)}
+
+
+class _CommunicatorConn:
+    def __init__(self, comm):
+        self.comm = comm
+
+    async def send_json(self, data) -> None:
+        await self.comm.send_json_to(data)
+
+    async def receive_json(self, timeout: Optional[float] = None):
+        # Read the output queue directly: the communicator's own receive cancels
+        # the consumer on timeout, which would break polling with short timeouts
+        if self.comm.future.done():
+            self.comm.future.result()
+            raise ConnectionClosed("consumer finished")
+        msg = await asyncio.wait_for(self.comm.output_queue.get(), timeout)
+        if msg["type"] == "websocket.close":
+            raise ConnectionClosed(f"closed by server ({msg.get('code', 1000)})")
+        return json.loads(msg["text"])
+
+    async def close(self) -> None:
+        if not self.comm.future.done():
+            await self.comm.disconnect()
+
+
+class InProcessTransport:
+    """Drives the ASGI application directly (channels' WebsocketCommunicator); no sockets."""
+
+    def __init__(self, application):
+        self.application = application
+
+    async def connect(self, path: str, timeout: float):
+        from channels.testing import WebsocketCommunicator
+
+        comm = WebsocketCommunicator(self.application, path)
+        connected, _ = await comm.connect(timeout=timeout)
+        if not connected:
+            raise ConnectionError("rejected")
+        return _CommunicatorConn(comm)
+
+
+class SocketTransport:
+    """Real WebSocket connections to a running server, e.g. ws://127.0.0.1:8000."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+
+    async def connect(self, path: str, timeout: float):
+        return await WebSocketClient.connect(self.base_url + path, timeout=timeout)
+
+
+class LoadStats:
+    def __init__(self):
+        self.connect: List[float] = []
+        self.ttft: List[float] = []
+        self.tokens_per_sec: List[float] = []
+        self.answer: List[float] = []
+        self.cancel_ack: List[float] = []
+        self.progress_latency: List[float] = []
+        self.outcomes: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.progress_events = 0
+        self.open = 0
+        self.peak_open = 0
+
+    def opened(self) -> None:
+        self.open += 1
+        self.peak_open = max(self.peak_open, self.open)
+
+    def error(self, kind: str, detail: str) -> None:
+        self.outcomes[kind] += 1
+        self.errors[f"{kind}: {detail[:80]}"] += 1
+
+
+async def chat_client(transport, video_id: int, cfg: Dict, rng: random.Random, stats: LoadStats) -> None:
+    t0 = time.perf_counter()
+    try:
+        conn = await transport.connect(f"/ws/videos/{video_id}/chat/", cfg["timeout"])
+    except Exception as e:
+        stats.error("connect_error", str(e) or type(e).__name__)
+        return
+    stats.connect.append(time.perf_counter() - t0)
+    stats.opened()
+    try:
+        await conn.receive_json(cfg["timeout"])  # greeting
+        for i in range(cfg["questions"]):
+            cancel_after = rng.randint(1, 5) if rng.random() < cfg["cancel_ratio"] else None
+            sent = time.perf_counter()
+            await conn.send_json({"type": "user_message", "text": f"question {i}: what is said about ka lo?"})
+            first = canceled_at = None
+            tokens = 0
+            while True:
+                msg = await conn.receive_json(cfg["timeout"])
+                kind = msg.get("type")
+                if kind == "chat_token":
+                    tokens += 1
+                    if first is None:
+                        first = time.perf_counter()
+                        stats.ttft.append(first - sent)
+                    if cancel_after and canceled_at is None and tokens >= cancel_after:
+                        canceled_at = time.perf_counter()
+                        await conn.send_json({"type": "cancel"})
+                elif kind == "chat_done":
+                    # A cancel that lost the race with the last token is a completed answer
+                    done = time.perf_counter()
+                    stats.answer.append(done - sent)
+                    if first is not None and tokens > 1 and done > first:
+                        stats.tokens_per_sec.append((tokens - 1) / (done - first))
+                    stats.outcomes["ok"] += 1
+                    break
+                elif kind == "chat_info" and msg.get("message") == "Canceled." and canceled_at is not None:
+                    stats.cancel_ack.append(time.perf_counter() - canceled_at)
+                    stats.outcomes["canceled"] += 1
+                    break
+                elif kind == "chat_error":
+                    stats.error("chat_error", msg.get("error", ""))
+                    break
+            if cfg["think"]:
+                await asyncio.sleep(rng.uniform(0, 2 * cfg["think"]))
+    except asyncio.TimeoutError:
+        stats.error("timeout", f"no message within {cfg['timeout']}s")
+    except ConnectionClosed as e:
+        stats.error("closed", str(e))
+    except Exception as e:
+        stats.error("client_error", f"{type(e).__name__}: {e}")
+    finally:
+        stats.open -= 1
+        try:
+            await conn.close()
+        except Exception:
+            pass
+
+
+async def progress_client(transport, video_id: int, cfg: Dict, stats: LoadStats, stop: asyncio.Event) -> None:
+    t0 = time.perf_counter()
+    try:
+        conn = await transport.connect(f"/ws/videos/{video_id}/progress/", cfg["timeout"])
+    except Exception as e:
+        stats.error("connect_error", str(e) or type(e).__name__)
+        return
+    stats.connect.append(time.perf_counter() - t0)
+    stats.opened()
+    try:
+        while not stop.is_set():
+            try:
+                msg = await conn.receive_json(0.5)
+            except asyncio.TimeoutError:
+                continue
+            stats.progress_events += 1
+            sent = msg.get("message", "")
+            if sent.startswith("loadtest@"):
+                # Publisher and consumer share this process's clock only in-process
+                stats.progress_latency.append(time.perf_counter() - float(sent[9:]))
+    except ConnectionClosed as e:
+        stats.error("closed", str(e))
+    except Exception as e:
+        stats.error("client_error", f"{type(e).__name__}: {e}")
+    finally:
+        stats.open -= 1
+        try:
+            await conn.close()
+        except Exception:
+            pass
+
+
+async def publish_progress(video_id: int, interval: float, stop: asyncio.Event) -> None:
+    from channels.layers import get_channel_layer
+
+    layer = get_channel_layer()
+    pct = 0
+    while not stop.is_set():
+        await layer.group_send(
+            f"video_{video_id}",
+            {"type": "progress", "stage": "loadtest", "pct": pct, "message": f"loadtest@{time.perf_counter()}"},
+        )
+        pct = (pct + 1) % 100
+        await asyncio.sleep(interval)
+
+
+async def run_load(transport, video_id: int, cfg: Dict, in_process: bool) -> Dict:
+    stats = LoadStats()
+    stop = asyncio.Event()
+    rng = random.Random(cfg["seed"])
+    n_total = cfg["chat"] + cfg["progress"]
+    delay = cfg["ramp"] / n_total if n_total else 0.0
+
+    async def staggered(i: int, coro):
+        await asyncio.sleep(i * delay)
+        await coro
+
+    started = time.perf_counter()
+    progress_tasks = [
+        asyncio.create_task(staggered(i, progress_client(transport, video_id, cfg, stats, stop)))
+        for i in range(cfg["progress"])
+    ]
+    publisher = None
+    if in_process and cfg["progress"]:
+        publisher = asyncio.create_task(publish_progress(video_id, cfg["progress_interval"], stop))
+    chat_tasks = [
+        asyncio.create_task(staggered(cfg["progress"] + i, chat_client(transport, video_id, cfg, random.Random(rng.random()), stats)))
+        for i in range(cfg["chat"])
+    ]
+    await asyncio.gather(*chat_tasks)
+    if not chat_tasks:
+        await asyncio.sleep(cfg["ramp"] + cfg["hold"])
+    stop.set()
+    await asyncio.gather(*progress_tasks)
+    if publisher is not None:
+        await publisher
+    wall = time.perf_counter() - started
+
+    questions = sum(stats.outcomes[k] for k in ("ok", "canceled"))
+    return {
+        "config": cfg,
+        "wall_sec": wall,
+        "peak_open_sockets": stats.peak_open,
+        "questions_per_sec": questions / wall if wall else 0.0,
+        "outcomes": dict(stats.outcomes),
+        "errors": dict(stats.errors.most_common(10)),
+        "progress_events": stats.progress_events,
+        "latency": {
+            "connect": percentiles(stats.connect),
+            "ttft": percentiles(stats.ttft),
+            "answer": percentiles(stats.answer),
+            "cancel_ack": percentiles(stats.cancel_ack),
+            "progress_delivery": percentiles(stats.progress_latency),
+        },
+        "tokens_per_sec": percentiles(stats.tokens_per_sec),
+    }
+
+
+def print_report(report: Dict) -> None:
+    cfg = report["config"]
+    print(
+        f"{cfg['chat']} chat + {cfg['progress']} progress sockets, {cfg['questions']} questions each, "
+        f"cancel ratio {cfg['cancel_ratio']}, ramp {cfg['ramp']}s"
+    )
+    print(
+        f"wall {report['wall_sec']:.2f}s  peak open {report['peak_open_sockets']}  "
+        f"{report['questions_per_sec']:.1f} questions/s  progress events {report['progress_events']}"
+    )
+    print("outcomes: " + ", ".join(f"{k}={v}" for k, v in sorted(report["outcomes"].items())))
+    print(f"{'latency (ms)':<18} {'n':>7} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}")
+    for name, p in report["latency"].items():
+        if p["n"]:
+            print(f"{name:<18} {p['n']:>7} " + " ".join(f"{p[k] * 1000:>9.1f}" for k in ("p50", "p90", "p99", "max")))
+    p = report["tokens_per_sec"]
+    if p["n"]:
+        print(f"{'tokens/sec':<18} {p['n']:>7} " + " ".join(f"{p[k]:>9.1f}" for k in ("p50", "p90", "p99", "max")))
+    for err, n in report["errors"].items():
+        print(f"  {n:>6} x {err}")
+
+
+def main(args) -> int:
+    cfg = {
+        "chat": args.chat,
+        "progress": args.progress,
+        "questions": args.questions,
+        "cancel_ratio": args.cancel_ratio,
+        "think": args.think,
+        "ramp": args.ramp,
+        "hold": args.hold,
+        "timeout": args.timeout,
+        "progress_interval": args.progress_interval,
+        "tokens": args.tokens,
+        "seed": args.seed,
+        "target": args.url or "in-process",
+    }
+    if args.url:
+        if args.video is None:
+            raise SystemExit("--video is required with --url (an indexed video on that server)")
+        report = asyncio.run(run_load(SocketTransport(args.url), args.video, cfg, in_process=False))
+    else:
+        report = _run_in_process(args, cfg)
+    print_report(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+def _run_in_process(args, cfg: Dict) -> Dict:
+    import os
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "server.settings")
+    os.environ["DISABLE_MODEL_WARMUP"] = "true"
+    os.environ["ALLOW_MODEL_DOWNLOADS"] = "false"
+    import django
+
+    django.setup()
+    from django.test.utils import setup_databases, setup_test_environment, teardown_databases
+
+    from server.asgi import application
+
+    from .fake_openai import FakeOpenAIServer
+    from .stubs import stub_backends
+    from .suites import _env, _index, _video
+    from .synthetic import transcript
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        with stub_backends(dim=args.dim), FakeOpenAIServer(args.tokens, args.llm_ttft, args.llm_interval) as llm, _env(
+            OPENAI_BASE_URL=llm.base_url, OPENAI_API_KEY="loadtest"
+        ):
+            video = _video("loadtest")
+            _index(video, transcript(200, seed=args.seed), args.dim)
+            return asyncio.run(run_load(InProcessTransport(application), video.id, cfg, in_process=True))
+    finally:
+        teardown_databases(old_config, verbosity=0)
@@ -0,0 +1,106 @@
+from __future__ import annotations
+import time
+import wave
+from collections import namedtuple
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+from .synthetic import text_vector, transcript
+
+_Segment = namedtuple("_Segment", "start end text")
+_Info = namedtuple("_Info", "language language_probability duration")
+
+
+class StubEmbedder:
+    """
+    SentenceTransformer stand-in. encode() works batch by batch like the real
+    model and charges batch_overhead_sec per batch (kernel launch/tokenizer
+    setup), so batching regressions in embed_texts still show up.
+    """
+
+    def __init__(self, dim: int = 384, batch_overhead_sec: float = 0.0005):
+        self.dim = dim
+        self.batch_overhead_sec = batch_overhead_sec
+
+    def encode(self, texts, normalize_embeddings=True, batch_size=32, show_progress_bar=False):
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i in range(0, len(texts), max(1, batch_size)):
+            if self.batch_overhead_sec:
+                time.sleep(self.batch_overhead_sec)
+            for j, t in enumerate(texts[i:i + batch_size]):
+                out[i + j] = text_vector(t, self.dim)
+        return out
+
+
+class StubWhisper:
+    """
+    WhisperModel stand-in returning a deterministic synthetic transcript of
+    n_segments segments. rtf > 0 sleeps rtf x audio duration to model decode cost.
+    """
+
+    def __init__(self, n_segments: int = 100, seed: int = 0, rtf: float = 0.0):
+        self.n_segments = n_segments
+        self.seed = seed
+        self.rtf = rtf
+
+    def transcribe(self, path, **options):
+        segs = transcript(self.n_segments, seed=self.seed)
+        duration = segs[-1]["end"] if segs else 0.0
+        if self.rtf:
+            time.sleep(self.rtf * duration)
+        gen = (_Segment(s["start"], s["end"], s["text"]) for s in segs)
+        return gen, _Info(options.get("language") or "en", 1.0, duration)
+
+
+def write_silence(path, seconds: float = 1.0, sample_rate: int = 16000) -> None:
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(b"\0\0" * int(seconds * sample_rate))
+
+
+def _stub_extract_audio(file_path, out_path, sample_rate: int = 16000) -> None:
+    write_silence(out_path, 1.0, sample_rate)
+
+
+def _stub_generate_frame(file_path, out_path, ts_seconds: float) -> None:
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    Path(out_path).write_bytes(b"\xff\xd8\xff\xd9")  # empty JPEG
+
+
+@contextmanager
+def stub_backends(
+    dim: int = 384,
+    whisper: Optional[StubWhisper] = None,
+    batch_overhead_sec: float = 0.0005,
+) -> Iterator[StubWhisper]:
+    """
+    Swap the Whisper and embedding models and ffmpeg calls for stubs for the
+    duration of the block. Yields the StubWhisper so callers can size transcripts.
+    """
+    from videos import services
+    from videos.utils import embeddings, transcription
+
+    whisper = whisper or StubWhisper()
+    saved: List = [
+        (embeddings, "_model_cache", embeddings._model_cache),
+        (transcription, "_whisper_cache", transcription._whisper_cache),
+        (services, "extract_audio", services.extract_audio),
+        (services, "generate_frame", services.generate_frame),
+    ]
+    embeddings._model_cache = StubEmbedder(dim, batch_overhead_sec)
+    # Cached query vectors may come from another model or dimension
+    embeddings._query_cache.clear()
+    transcription._whisper_cache = whisper
+    services.extract_audio = _stub_extract_audio
+    services.generate_frame = _stub_generate_frame
+    try:
+        yield whisper
+    finally:
+        for mod, name, value in saved:
+            setattr(mod, name, value)
+        embeddings._query_cache.clear()
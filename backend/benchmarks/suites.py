@@ -0,0 +1,251 @@
+from __future__ import annotations
+import asyncio
+import itertools
+import os
+import shutil
+import statistics
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+
+from videos import services
+from videos.models import TranscriptSegment, Video
+from videos.quantized import build_quantized_index
+from videos.segment_writer import copy_available, copy_segments, orm_segments, replace_video_segments
+from videos.shards import write_shard
+from videos.utils.chunking import chunk_segments
+from videos.utils.embeddings import embed_texts, model_fingerprint
+from videos.utils.search import cosine
+
+from .fake_openai import FakeOpenAIServer
+from .harness import Results
+from .stubs import stub_backends
+from .synthetic import embeddings, text_vector, transcript
+
+SCALES: Dict[str, Dict] = {
+    # segments: per-video transcript sizes; videos: database sizes for search
+    "smoke": {"segments": [100, 1000], "videos": [1, 10], "chat_tokens": [50], "repeat": 3},
+    "small": {"segments": [100, 1000, 10000], "videos": [1, 100, 1000], "chat_tokens": [50, 500], "repeat": 5},
+    "large": {
+        "segments": [100, 1000, 10000, 100000],
+        "videos": [1, 100, 1000, 10000],
+        "chat_tokens": [50, 500, 2000],
+        "repeat": 5,
+    },
+}
+SEGMENTS_PER_VIDEO = 40  # for the videos-in-database scale (~3 minute videos)
+EMBED_BATCH_SIZES = (32, 256)
+MAX_EMBED_TEXTS = 10_000
+MAX_PIPELINE_SEGMENTS = 10_000
+
+
+def _repeat(opts: Dict, n: int) -> int:
+    # The largest sizes take seconds per run; a single sample is enough to spot a regression
+    return opts["repeat"] if n <= 10_000 else 1
+
+
+def _rows(segs: List[Dict], vecs: np.ndarray) -> Iterator[Tuple[str, float, float, List[float]]]:
+    for s, v in zip(segs, vecs):
+        yield s["text"], s["start"], s["end"], v.tolist()
+
+
+def _video(title: str) -> Video:
+    return Video.objects.create(title=title, file=ContentFile(b"\0" * 1024, name=f"{title}.mp4"), status="ready")
+
+
+def _index(video: Video, segs: List[Dict], dim: int) -> None:
+    vecs = np.stack([text_vector(s["text"], dim) for s in segs]) if segs else np.zeros((0, dim), np.float32)
+    replace_video_segments(video.id, _rows(segs, vecs))
+    Video.objects.filter(id=video.id).update(index_version=video.index_version + 1)
+    video.refresh_from_db(fields=["index_version"])
+
+
+@contextmanager
+def _env(**values):
+    old = {k: os.environ.get(k) for k in values}
+    os.environ.update({k: str(v) for k, v in values.items()})
+    try:
+        yield
+    finally:
+        for k, v in old.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+def ingest(res: Results, opts: Dict) -> None:
+    print("ingest")
+    dim = opts["dim"]
+    with stub_backends(dim=dim) as whisper:
+        for n in opts["segments"]:
+            segs = transcript(n, seed=opts["seed"])
+            res.time("chunk_segments", {"segments": n}, lambda: chunk_segments(segs, window_sec=15.0), repeat=_repeat(opts, n))
+
+        for n in opts["segments"]:
+            texts = [c["text"] for c in chunk_segments(transcript(n, seed=opts["seed"]))][:MAX_EMBED_TEXTS]
+            for bs in EMBED_BATCH_SIZES:
+                res.time(
+                    "embed_texts", {"texts": len(texts), "batch": bs},
+                    lambda: embed_texts(texts, batch_size=bs), repeat=_repeat(opts, len(texts)),
+                    extra=lambda s, m=len(texts): {"texts_per_sec": m / statistics.median(s)},
+                )
+
+        writers = ["orm"] + (["binary", "csv"] if copy_available() else [])
+        video = _video("bench-index")
+        for n in opts["segments"]:
+            segs = transcript(n, seed=opts["seed"])
+            vecs = embeddings(n, dim, seed=opts["seed"])
+            for fmt in writers:
+                res.time(
+                    "index_segments", {"segments": n, "writer": fmt},
+                    lambda: replace_video_segments(video.id, _rows(segs, vecs), fmt=fmt), repeat=_repeat(opts, n),
+                    extra=lambda s, m=n: {"rows_per_sec": m / statistics.median(s)},
+                )
+
+        # Full pipeline minus ffmpeg/Whisper decode time, from a cold checkpoint directory
+        pv = _video("bench-pipeline")
+        path = Path(settings.MEDIA_ROOT) / pv.file.name
+        ckpt = Path(settings.PIPELINE_CHECKPOINT_DIR) / str(pv.id)
+        for n in [s for s in opts["segments"] if s <= MAX_PIPELINE_SEGMENTS]:
+            whisper.n_segments = n
+            res.time(
+                "process_video", {"segments": n},
+                lambda: services.process_video(pv.id, path), repeat=_repeat(opts, n),
+                setup=lambda: shutil.rmtree(ckpt, ignore_errors=True),
+            )
+
+
+def search(res: Results, opts: Dict) -> None:
+    print("search")
+    dim = opts["dim"]
+    rng = np.random.default_rng(opts["seed"])
+
+    for n in opts["segments"]:
+        # Rows as segment_vectors() returns them: JSON-decoded lists
+        rows = [{"embedding": v} for v in embeddings(n, dim, seed=opts["seed"]).tolist()]
+        q = embeddings(1, dim, seed=opts["seed"] + 1)[0].tolist()
+
+        def score():
+            scored = [(cosine(q, r["embedding"]), r) for r in rows]
+            scored.sort(key=lambda x: x[0], reverse=True)
+
+        res.time("cosine_scoring", {"segments": n}, score, repeat=_repeat(opts, n))
+
+    with stub_backends(dim=dim):
+        video = _video("bench-search")
+        for n in opts["segments"]:
+            segs = transcript(n, seed=opts["seed"])
+            _index(video, segs, dim)
+            queries = [segs[int(i)]["text"] for i in rng.integers(0, n, size=8)]
+            cycle = itertools.cycle(queries)
+            # The index stage also writes the video's vector shard
+            seg_ids = list(TranscriptSegment.objects.filter(video=video).order_by("id").values_list("id", flat=True))
+            vecs = np.stack([text_vector(s["text"], dim) for s in segs])
+            write_shard(
+                video.id, video.index_version, model_fingerprint(), seg_ids,
+                [s["start"] for s in segs], [s["end"] for s in segs], [s["text"] for s in segs], vecs,
+            )
+            # int8 without shards rescores candidates fetched from the database
+            for scheme, shards in (("none", "true"), ("int8", "true"), ("int8", "false")):
+                with _env(SEARCH_QUANTIZATION=scheme, VECTOR_SHARDS=shards):
+                    if scheme != "none":
+                        build_quantized_index(video.id, video.index_version, model_fingerprint(), seg_ids, vecs, scheme)
+                    res.time(
+                        "search_video",
+                        {"segments": n, "quantization": scheme, **({"shards": False} if shards == "false" else {})},
+                        lambda: services.search_video(video, next(cycle), k=5),
+                        repeat=max(_repeat(opts, n), 3),
+                    )
+
+        # Search latency as the database grows (other videos' rows must not slow one video down)
+        target = _video("bench-db-target")
+        _index(target, transcript(SEGMENTS_PER_VIDEO, seed=opts["seed"]), dim)
+        query = "ka lo mi"
+        have = 1
+        for n_videos in opts["videos"]:
+            _add_videos(n_videos - have, dim, opts["seed"] + have)
+            have = max(have, n_videos)
+            res.time(
+                "search_video_db", {"videos": n_videos, "segments_per_video": SEGMENTS_PER_VIDEO},
+                lambda: services.search_video(target, query, k=5), repeat=opts["repeat"],
+            )
+            res.time(
+                "cached_search_hit", {"videos": n_videos},
+                lambda: services.cached_search_video(target, query, k=5), repeat=opts["repeat"],
+            )
+
+
+def _add_videos(count: int, dim: int, seed: int) -> None:
+    if count <= 0:
+        return
+    segs = transcript(SEGMENTS_PER_VIDEO, seed=seed)
+    vecs = embeddings(SEGMENTS_PER_VIDEO, dim, seed=seed)
+    videos = Video.objects.bulk_create([Video(title=f"bench-{seed}-{i}", file="videos/bench.mp4", status="ready") for i in range(count)])
+    if not videos or videos[0].id is None:  # backends that do not return ids from bulk_create
+        videos = list(Video.objects.filter(title__startswith=f"bench-{seed}-"))
+    with transaction.atomic():
+        for v in videos:
+            if connection.vendor == "postgresql":
+                copy_segments(v.id, _rows(segs, vecs), 5000)
+            else:
+                orm_segments(v.id, _rows(segs, vecs), 5000)
+
+
+async def _chat_once(application, video_id: int) -> Tuple[float, float, int]:
+    from channels.testing import WebsocketCommunicator
+
+    comm = WebsocketCommunicator(application, f"/ws/videos/{video_id}/chat/")
+    connected, _ = await comm.connect()
+    if not connected:
+        raise RuntimeError("websocket connect rejected")
+    await comm.receive_json_from(timeout=10)  # greeting
+    t0 = time.perf_counter()
+    await comm.send_json_to({"type": "user_message", "text": "what is said about ka lo?"})
+    first = None
+    tokens = 0
+    while True:
+        msg = await comm.receive_json_from(timeout=30)
+        if msg["type"] == "chat_token":
+            tokens += 1
+            if first is None:
+                first = time.perf_counter()
+        elif msg["type"] == "chat_done":
+            break
+        elif msg["type"] == "chat_error":
+            raise RuntimeError(msg["error"])
+    total = time.perf_counter() - t0
+    await comm.disconnect()
+    return total, (first or time.perf_counter()) - t0, tokens
+
+
+def chat(res: Results, opts: Dict) -> None:
+    print("chat")
+    from server.asgi import application
+
+    with stub_backends(dim=opts["dim"]):
+        video = _video("bench-chat")
+        _index(video, transcript(200, seed=opts["seed"]), opts["dim"])
+        for n_tokens in opts["chat_tokens"]:
+            with FakeOpenAIServer(tokens=n_tokens) as server, _env(OPENAI_BASE_URL=server.base_url, OPENAI_API_KEY="bench"):
+                runs = [asyncio.run(_chat_once(application, video.id)) for _ in range(opts["repeat"] + 1)][1:]
+            totals = [r[0] for r in runs]
+            ttfts = [r[1] for r in runs]
+            streaming = [r[0] - r[1] for r in runs]
+            res.add(
+                "chat_stream", {"tokens": n_tokens}, totals,
+                extra={
+                    "ttft_ms": statistics.median(ttfts) * 1000,
+                    "tokens_per_sec": n_tokens / max(statistics.median(streaming), 1e-9),
+                    "tokens_received": runs[-1][2],
+                },
+            )
+
+
+SUITES = {"ingest": ingest, "search": search, "chat": chat}
@@ -0,0 +1,67 @@
+from __future__ import annotations
+import hashlib
+from typing import Dict, List
+
+import numpy as np
+
+_SYLLABLES = [
+    "ka", "lo", "mi", "ra", "te", "sun", "vi", "dor", "pel", "an", "qui", "ze", "mo", "ter", "ul",
+    "bra", "fen", "gi", "hal", "jo", "nes", "ox", "pri", "sta", "tor", "wen", "yl", "cor", "dra", "el",
+]
+
+
+def vocabulary(size: int = 4000, seed: int = 0) -> List[str]:
+    """Deterministic pseudo-words, so transcripts have realistic token lengths without a corpus."""
+    rng = np.random.default_rng(seed)
+    words: List[str] = []
+    seen = set()
+    while len(words) < size:
+        w = "".join(rng.choice(_SYLLABLES, size=int(rng.integers(1, 4))))
+        if w not in seen:
+            seen.add(w)
+            words.append(w)
+    return words
+
+
+def transcript(n_segments: int, seed: int = 0, vocab: List[str] | None = None) -> List[Dict]:
+    """
+    Whisper-shaped segments ({"start", "end", "text"}) of 2-6 s with 6-20 words
+    each, drawn from a Zipf-like word distribution.
+    """
+    vocab = vocab or vocabulary()
+    rng = np.random.default_rng(seed)
+    ranks = np.arange(1, len(vocab) + 1, dtype=np.float64)
+    p = 1.0 / ranks
+    p /= p.sum()
+    lengths = rng.integers(6, 21, size=n_segments)
+    durations = rng.uniform(2.0, 6.0, size=n_segments)
+    word_ids = rng.choice(len(vocab), size=int(lengths.sum()), p=p)
+    out: List[Dict] = []
+    t = 0.0
+    pos = 0
+    for n, d in zip(lengths, durations):
+        words = word_ids[pos:pos + n]
+        pos += n
+        out.append({"start": round(t, 3), "end": round(t + d, 3), "text": " ".join(vocab[i] for i in words)})
+        t += d
+    return out
+
+
+def text_vector(text: str, dim: int) -> np.ndarray:
+    """
+    Unit vector for a text from hashed word features: deterministic, and texts
+    sharing words get positive cosine similarity, like a real sentence embedder.
+    """
+    v = np.zeros(dim, dtype=np.float32)
+    for w in text.split():
+        h = int.from_bytes(hashlib.blake2b(w.encode("utf-8"), digest_size=8).digest(), "little")
+        v[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    n = np.linalg.norm(v)
+    return v / n if n else v
+
+
+def embeddings(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vecs = rng.standard_normal((n, dim), dtype=np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs
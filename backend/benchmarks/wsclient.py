@@ -0,0 +1,130 @@
+from __future__ import annotations
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class ConnectionClosed(Exception):
+    pass
+
+
+class WebSocketClient:
+    """
+    Minimal RFC 6455 client on asyncio streams (ws:// only, text frames), enough
+    to drive the consumers over a real socket without extra dependencies.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.closed = False
+
+    @classmethod
+    async def connect(cls, url: str, timeout: float = 10.0) -> "WebSocketClient":
+        parts = urlsplit(url)
+        if parts.scheme != "ws":
+            raise ValueError("only ws:// URLs are supported")
+        host, port = parts.hostname, parts.port or 80
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        key = base64.b64encode(os.urandom(16)).decode("ascii")
+        writer.write((
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {host}:{port}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n"
+            f"Origin: http://{host}:{port}\r\n"
+            "\r\n"
+        ).encode("ascii"))
+        await writer.drain()
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+        lines = head.decode("latin-1").split("\r\n")
+        if not lines[0].startswith("HTTP/1.1 101"):
+            writer.close()
+            raise ConnectionError(f"handshake rejected: {lines[0]}")
+        headers = {k.strip().lower(): v.strip() for k, _, v in (ln.partition(":") for ln in lines[1:] if ln)}
+        expected = base64.b64encode(hashlib.sha1(key.encode("ascii") + _GUID).digest()).decode("ascii")
+        if headers.get("sec-websocket-accept") != expected:
+            writer.close()
+            raise ConnectionError("handshake failed: bad Sec-WebSocket-Accept")
+        return cls(reader, writer)
+
+    def _frame(self, opcode: int, payload: bytes) -> bytes:
+        n = len(payload)
+        if n < 126:
+            head = struct.pack(">BB", 0x80 | opcode, 0x80 | n)
+        elif n < 1 << 16:
+            head = struct.pack(">BBH", 0x80 | opcode, 0x80 | 126, n)
+        else:
+            head = struct.pack(">BBQ", 0x80 | opcode, 0x80 | 127, n)
+        mask = os.urandom(4)
+        # Client frames must be masked
+        return head + mask + _mask(payload, mask)
+
+    async def send_json(self, data: Any) -> None:
+        self.writer.write(self._frame(0x1, json.dumps(data).encode("utf-8")))
+        await self.writer.drain()
+
+    async def _read_frame(self):
+        b1, b2 = await self.reader.readexactly(2)
+        n = b2 & 0x7F
+        if n == 126:
+            (n,) = struct.unpack(">H", await self.reader.readexactly(2))
+        elif n == 127:
+            (n,) = struct.unpack(">Q", await self.reader.readexactly(8))
+        mask = await self.reader.readexactly(4) if b2 & 0x80 else None
+        payload = await self.reader.readexactly(n)
+        if mask:
+            payload = _mask(payload, mask)
+        return bool(b1 & 0x80), b1 & 0x0F, payload
+
+    async def receive_json(self, timeout: Optional[float] = None) -> Any:
+        return json.loads(await asyncio.wait_for(self._receive_text(), timeout))
+
+    async def _receive_text(self) -> str:
+        parts = []
+        while True:
+            try:
+                fin, opcode, payload = await self._read_frame()
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                self.closed = True
+                raise ConnectionClosed(str(e))
+            if opcode == 0x8:
+                self.closed = True
+                raise ConnectionClosed(f"closed by server ({struct.unpack('>H', payload[:2])[0] if len(payload) >= 2 else 1005})")
+            if opcode == 0x9:
+                self.writer.write(self._frame(0xA, payload))
+                continue
+            if opcode in (0x1, 0x0):
+                parts.append(payload)
+                if fin:
+                    return b"".join(parts).decode("utf-8")
+
+    async def close(self, code: int = 1000) -> None:
+        if not self.closed:
+            self.closed = True
+            try:
+                self.writer.write(self._frame(0x8, struct.pack(">H", code)))
+                await self.writer.drain()
+            except ConnectionError:
+                pass
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except Exception:
+            pass
+
+
+def _mask(payload: bytes, mask: bytes) -> bytes:
+    n = len(payload)
+    key = (mask * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, "little") ^ int.from_bytes(key, "little")).to_bytes(n, "little")
@@ -99,6 +99,11 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 MEDIA_ROOT = os.getenv('MEDIA_ROOT', str(BASE_DIR / '.media'))
 MEDIA_URL = '/media/'
+# Per-stage pipeline artifacts (audio, transcript, chunks, embeddings); kept out of
+# MEDIA_ROOT since everything there is publicly served
+PIPELINE_CHECKPOINT_DIR = os.getenv('PIPELINE_CHECKPOINT_DIR', str(BASE_DIR / '.checkpoints'))
+# Memory-mapped per-video vector shards; MediaView refuses to serve this directory
+VECTOR_SHARD_DIR = os.getenv('VECTOR_SHARD_DIR', os.path.join(MEDIA_ROOT, 'shards'))
 STATIC_URL = 'static/'
 
 # Default primary key field type
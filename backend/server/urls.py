@@ -1,12 +1,19 @@
+import re
+
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from videos.views import MediaView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('videos.urls')),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Media is served by a Range-aware view in every environment (not only under DEBUG);
+# set MEDIA_ACCEL_REDIRECT to let a fronting nginx do the actual file transfer.
+if settings.MEDIA_URL.startswith('/'):
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), MediaView.as_view(), name='media'),
+    ]
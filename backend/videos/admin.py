@@ -1,12 +1,40 @@
-from django.contrib import admin
-from .models import Video, TranscriptSegment
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib import admin, messages
+
+from .models import EmbeddingSet, TranscriptSegment, Video
+from .services import PIPELINE_STAGES, process_video
+from .utils.scheduler import IngestQueueFull, get_core_budget
+
+
+def _reprocess_action(from_stage=None):
+    def action(modeladmin, request, queryset):
+        done = 0
+        for video in queryset:
+            try:
+                with get_core_budget().ingest_slot():
+                    process_video(video.id, Path(settings.MEDIA_ROOT) / video.file.name, from_stage=from_stage)
+                done += 1
+            except IngestQueueFull as e:
+                modeladmin.message_user(request, f"Stopped at video {video.id}: {e}", messages.WARNING)
+                break
+            except Exception as e:
+                modeladmin.message_user(request, f"Video {video.id}: {e}", messages.ERROR)
+        if done:
+            modeladmin.message_user(request, f"Processed {done} video(s)", messages.SUCCESS)
+
+    action.__name__ = f"rerun_from_{from_stage}" if from_stage else "resume_processing"
+    action.short_description = f"Re-run from {from_stage}" if from_stage else "Resume processing from checkpoints"
+    return action
 
 
 @admin.register(Video)
 class VideoAdmin(admin.ModelAdmin):
-    list_display = ("id", "title", "status", "duration_sec", "created_at")
+    list_display = ("id", "title", "status", "duration_sec", "language", "index_version", "created_at")
     search_fields = ("title",)
-    list_filter = ("status",)
+    list_filter = ("status", "language")
+    actions = [_reprocess_action()] + [_reprocess_action(stage) for stage in PIPELINE_STAGES]
 
 
 @admin.register(TranscriptSegment)
@@ -14,3 +42,11 @@ class TranscriptSegmentAdmin(admin.ModelAdmin):
     list_display = ("id", "video", "start_sec", "end_sec")
     search_fields = ("text",)
     list_filter = ("video",)
+
+
+@admin.register(EmbeddingSet)
+class EmbeddingSetAdmin(admin.ModelAdmin):
+    list_display = ("id", "model_name", "fingerprint", "dim", "status", "is_active", "created_at", "activated_at")
+    list_filter = ("status", "is_active")
+    # Activation goes through `manage.py reembed`, which backfills gaps before switching
+    readonly_fields = ("is_active", "activated_at")
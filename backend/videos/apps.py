@@ -7,6 +7,8 @@ class VideosConfig(AppConfig):
     name = "videos"
 
     def ready(self):
+        from . import signals  # noqa: F401
+
         # Warm up models at startup so first request doesn't pay the download/load cost
         if os.getenv("DISABLE_MODEL_WARMUP", "false").lower() == "true":
             return
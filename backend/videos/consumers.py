@@ -1,14 +1,19 @@
 from __future__ import annotations
 import asyncio
 import os
+import time
 from typing import Dict, List
 
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from django.db.models import QuerySet
 
-from .models import TranscriptSegment, Video
-from .utils.embeddings import embed_text
+from .embedding_sets import active_fingerprint, active_model_name, segment_vectors
+from .live_search import SegmentMatrix, load_matrix, rank
+from .models import Video
+from .services import _hhmmss, ensure_frame
+from .utils.embeddings import embed_query
+from .utils.metrics import counter, histogram
 from .utils.search import cosine
 
 try:
@@ -16,6 +21,28 @@ try:
 except Exception:  # pragma: no cover
     _OpenAIClient = None  # type: ignore
 
+CHAT_RETRIEVAL_SECONDS = histogram("scenequery_chat_retrieval_seconds", "Context retrieval time for chat questions")
+CHAT_TTFT_SECONDS = histogram(
+    "scenequery_chat_time_to_first_token_seconds", "Time from question to first streamed token (retrieval included)"
+)
+CHAT_TOKENS_PER_SECOND = histogram(
+    "scenequery_chat_tokens_per_second", "Streaming rate after the first token",
+    buckets=(1, 5, 10, 20, 40, 60, 80, 100, 150, 200, 400),
+)
+CHAT_TOKENS = counter("scenequery_chat_tokens_total", "Streamed completion tokens (content deltas)")
+CHAT_REQUESTS = counter("scenequery_chat_requests_total", "Chat answers by outcome", ["outcome"])
+LIVE_SEARCH_SECONDS = histogram(
+    "scenequery_search_ws_seconds", "Query-to-results latency on the search-as-you-type socket",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+LIVE_SEARCH_SUPERSEDED = counter(
+    "scenequery_search_ws_superseded_total", "Search-as-you-type queries dropped because a newer one arrived"
+)
+
+# How often a search socket re-checks the video's index_version and the active embedding set
+_MATRIX_TTL_SEC = 5.0
+_LIVE_SEARCH_MAX_K = 50
+
 
 class VideoProgressConsumer(AsyncJsonWebsocketConsumer):
     async def connect(self):
@@ -106,11 +133,14 @@ class VideoChatConsumer(AsyncJsonWebsocketConsumer):
             await self.send_json({"type": "chat_error", "error": f"Unknown message type: {msg_type}"})
 
     async def _handle_chat(self, question: str):
+        t0 = time.perf_counter()
         try:
             ctx = await self._retrieve_context(self.video_id, question, top_k=5)
         except Exception as e:
+            CHAT_REQUESTS.labels(outcome="error").inc()
             await self.send_json({"type": "chat_error", "error": f"Retrieval failed: {e}"})
             return
+        CHAT_RETRIEVAL_SECONDS.observe(time.perf_counter() - t0)
 
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
@@ -144,6 +174,8 @@ class VideoChatConsumer(AsyncJsonWebsocketConsumer):
                 ],
             )
 
+            first_at = None
+            tokens = 0
             async for event in stream:
                 try:
                     delta = event.choices[0].delta  # type: ignore[attr-defined]
@@ -153,11 +185,24 @@ class VideoChatConsumer(AsyncJsonWebsocketConsumer):
                     continue
                 token = getattr(delta, "content", None)
                 if token:
+                    if first_at is None:
+                        first_at = time.perf_counter()
+                        CHAT_TTFT_SECONDS.observe(first_at - t0)
+                    tokens += 1
                     await self.send_json({"type": "chat_token", "token": token})
+            if first_at is not None:
+                CHAT_TOKENS.inc(tokens)
+                elapsed = time.perf_counter() - first_at
+                if tokens > 1 and elapsed > 0:
+                    # The first token opens the window, so it is not counted in the rate
+                    CHAT_TOKENS_PER_SECOND.observe((tokens - 1) / elapsed)
+            CHAT_REQUESTS.labels(outcome="ok").inc()
             await self.send_json({"type": "chat_done"})
         except asyncio.CancelledError:
+            CHAT_REQUESTS.labels(outcome="canceled").inc()
             await self.send_json({"type": "chat_info", "message": "Generation canceled."})
         except Exception as e:
+            CHAT_REQUESTS.labels(outcome="error").inc()
             try:
                 print(f"[ws-chat] error video_id={self.video_id}: {e}")
             except Exception:
@@ -168,15 +213,12 @@ class VideoChatConsumer(AsyncJsonWebsocketConsumer):
                 self._chat_task = None
 
     async def _retrieve_context(self, video_id: int, question: str, top_k: int = 5) -> str:
-        qvec = await asyncio.get_event_loop().run_in_executor(None, embed_text, question)
+        model_name = await database_sync_to_async(active_model_name)()
+        qvec = await asyncio.get_event_loop().run_in_executor(None, embed_query, question, model_name)
 
         @database_sync_to_async
         def _fetch_segments() -> List[Dict]:
-            return list(
-                TranscriptSegment.objects.filter(video_id=video_id).values(
-                    "start_sec", "end_sec", "text", "embedding"
-                )
-            )
+            return segment_vectors(video_id, fields=("start_sec", "end_sec", "text"))
 
         segs: List[Dict] = await _fetch_segments()
         if not segs:
@@ -203,3 +245,151 @@ class VideoChatConsumer(AsyncJsonWebsocketConsumer):
             ts = _hhmmss(float(s["start_sec"]))
             lines.append(f"[{ts}] {s['text']}")
         return "\n".join(lines)
+
+
+class VideoSearchConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Search-as-you-type over one video. Each {type: "query"} replaces the one
+    before it: queries that arrive while another is running are coalesced to
+    the latest, and in-flight scoring of a superseded query stops early.
+    Results carry no frame; {type: "select"} renders the chosen one's frame.
+    """
+
+    async def connect(self):
+        self.video_id = int(self.scope["url_route"]["kwargs"]["video_id"])
+        self._generation = 0
+        self._pending: tuple | None = None
+        self._task: asyncio.Task | None = None
+        self._video: Video | None = None
+        self._matrix: SegmentMatrix | None = None
+        self._model_name: str | None = None
+        self._checked_at = 0.0
+        try:
+            await self._current_matrix()
+        except Video.DoesNotExist:
+            await self.close()
+            return
+        except Exception as e:
+            # Not searchable yet (e.g. still processing); queries retry the load
+            await self.accept()
+            await self.send_json({"type": "search_error", "error": f"Video not ready for search: {e}"})
+            return
+        await self.accept()
+        await self.send_json({
+            "type": "search_info",
+            "message": "Connected. Send queries as the user types." if len(self._matrix) else "No segments indexed yet.",
+            "segments": len(self._matrix),
+        })
+
+    async def disconnect(self, close_code):
+        self._generation += 1
+        self._pending = None
+        task = getattr(self, "_task", None)
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+
+    async def receive_json(self, content, **kwargs):
+        msg_type = content.get("type")
+        if msg_type == "query":
+            try:
+                k = max(1, min(_LIVE_SEARCH_MAX_K, int(content.get("k", 5))))
+            except (TypeError, ValueError):
+                await self.send_json({"type": "search_error", "error": "k must be an integer"})
+                return
+            self._generation += 1
+            seq = content.get("seq", self._generation)
+            self._pending = (self._generation, seq, (content.get("text") or "").strip(), k, time.perf_counter())
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._run_queries())
+        elif msg_type == "select":
+            await self._select(content)
+        elif msg_type == "cancel":
+            self._generation += 1
+            self._pending = None
+        else:
+            await self.send_json({"type": "search_error", "error": f"Unknown message type: {msg_type}"})
+
+    async def _current_matrix(self) -> SegmentMatrix:
+        now = time.monotonic()
+        if self._matrix is None or now - self._checked_at >= _MATRIX_TTL_SEC:
+            @database_sync_to_async
+            def _load():
+                video = Video.objects.get(id=self.video_id)
+                return video, load_matrix(video, active_fingerprint()), active_model_name()
+
+            self._video, self._matrix, self._model_name = await _load()
+            self._checked_at = now
+        return self._matrix
+
+    async def _run_queries(self):
+        loop = asyncio.get_running_loop()
+        while self._pending is not None:
+            generation, seq, text, k, t0 = self._pending
+            self._pending = None
+            if not text:
+                await self.send_json({"type": "search_results", "seq": seq, "query": text, "results": []})
+                continue
+
+            def is_stale(generation=generation) -> bool:
+                return generation != self._generation
+
+            try:
+                matrix = await self._current_matrix()
+                qvec = await loop.run_in_executor(None, embed_query, text, self._model_name)
+                ranked = None if is_stale() else await loop.run_in_executor(None, rank, matrix, qvec, k, is_stale)
+            except Exception as e:
+                await self.send_json({"type": "search_error", "seq": seq, "error": str(e)})
+                continue
+            if ranked is None or is_stale():
+                LIVE_SEARCH_SUPERSEDED.inc()
+                continue
+            elapsed = time.perf_counter() - t0
+            LIVE_SEARCH_SECONDS.observe(elapsed)
+            await self.send_json({
+                "type": "search_results",
+                "seq": seq,
+                "query": text,
+                "results": [
+                    {
+                        "segmentId": int(matrix.segment_ids[row]),
+                        "timestamp": float(matrix.start_sec[row]),
+                        "hhmmss": _hhmmss(float(matrix.start_sec[row])),
+                        "text": matrix.text(row),
+                        "score": round(score, 4),
+                    }
+                    for row, score in ranked
+                ],
+                "ms": round(elapsed * 1000, 2),
+            })
+
+    async def _select(self, content):
+        try:
+            matrix = await self._current_matrix()
+        except Exception as e:
+            await self.send_json({"type": "search_error", "error": f"Video not ready for search: {e}"})
+            return
+        try:
+            row = matrix.row(int(content.get("segmentId")))
+        except (TypeError, ValueError):
+            row = None
+        if row is None:
+            await self.send_json({"type": "search_error", "error": "Unknown segmentId"})
+            return
+        start_sec = float(matrix.start_sec[row])
+        try:
+            frame_name = await asyncio.get_running_loop().run_in_executor(None, ensure_frame, self._video, start_sec)
+        except Exception as e:
+            await self.send_json({"type": "search_error", "error": f"Frame failed: {e}"})
+            return
+        await self.send_json({
+            "type": "search_frame",
+            "segmentId": int(matrix.segment_ids[row]),
+            "timestamp": start_sec,
+            "hhmmss": _hhmmss(start_sec),
+            "text": matrix.text(row),
+            "frameUrl": f"/media/frames/{frame_name}",
+        })
@@ -0,0 +1,112 @@
+from __future__ import annotations
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import EmbeddingSet, SegmentEmbedding, TranscriptSegment
+from .utils.embeddings import embed_texts, model_fingerprint
+
+# Search workers re-read the active set at most this often, so a cutover made by
+# `manage.py reembed` in another process is picked up within a few seconds.
+_ACTIVE_TTL_SEC = 5.0
+_active_cache: tuple[float, Optional[EmbeddingSet]] | None = None
+_active_lock = threading.Lock()
+
+
+def active_embedding_set(refresh: bool = False) -> Optional[EmbeddingSet]:
+    global _active_cache
+    now = time.monotonic()
+    cached = _active_cache
+    if not refresh and cached is not None and now - cached[0] < _ACTIVE_TTL_SEC:
+        return cached[1]
+    with _active_lock:
+        es = EmbeddingSet.objects.filter(is_active=True).first()
+        _active_cache = (now, es)
+    return es
+
+
+def active_model_name() -> Optional[str]:
+    """Model to embed with; None means the configured EMBED_MODEL."""
+    es = active_embedding_set()
+    return es.model_name if es else None
+
+
+def active_fingerprint() -> str:
+    es = active_embedding_set()
+    return es.fingerprint if es else model_fingerprint()
+
+
+def segment_vectors(
+    video_id: int,
+    fields: Sequence[str] = ("id", "text", "start_sec", "end_sec"),
+    segment_ids: Optional[Sequence[int]] = None,
+) -> List[Dict]:
+    """
+    Segment rows for a video (optionally only segment_ids) with an "embedding" key
+    holding vectors of the active embedding set (or the legacy column while no
+    set is active).
+    """
+    es = active_embedding_set()
+    if es is None:
+        qs = TranscriptSegment.objects.filter(video_id=video_id)
+        if segment_ids is not None:
+            qs = qs.filter(id__in=list(segment_ids))
+        return list(qs.order_by("start_sec", "id").values(*fields, "embedding"))
+    qs = SegmentEmbedding.objects.filter(embedding_set=es, segment__video_id=video_id)
+    if segment_ids is not None:
+        qs = qs.filter(segment_id__in=list(segment_ids))
+    rows = qs.order_by("segment__start_sec", "segment_id").values("vector", *[f"segment__{f}" for f in fields])
+    out: List[Dict] = []
+    for r in rows:
+        d = {f: r[f"segment__{f}"] for f in fields}
+        d["embedding"] = r["vector"]
+        out.append(d)
+    return out
+
+
+def write_segment_embeddings(embedding_set_id: int, segment_ids: Sequence[int], vectors: Sequence[List[float]]) -> None:
+    SegmentEmbedding.objects.bulk_create(
+        [SegmentEmbedding(embedding_set_id=embedding_set_id, segment_id=sid, vector=v) for sid, v in zip(segment_ids, vectors)],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def missing_segments(embedding_set: EmbeddingSet):
+    """Segments that have no vector in the given set yet (e.g. indexed during a rebuild)."""
+    has_vec = SegmentEmbedding.objects.filter(embedding_set=embedding_set, segment_id=OuterRef("pk"))
+    return TranscriptSegment.objects.filter(~Exists(has_vec))
+
+
+def backfill_missing(embedding_set: EmbeddingSet, batch_size: int = 1024) -> int:
+    done = 0
+    while True:
+        batch = list(missing_segments(embedding_set).order_by("id").values_list("id", "text")[:batch_size])
+        if not batch:
+            return done
+        vecs = embed_texts([t for _, t in batch], model_name=embedding_set.model_name)
+        write_segment_embeddings(embedding_set.id, [i for i, _ in batch], vecs)
+        done += len(batch)
+
+
+def activate_embedding_set(embedding_set: EmbeddingSet) -> int:
+    """
+    Atomically make embedding_set the one search uses. Segments indexed while the
+    set was being built are embedded first, so the switch never exposes gaps.
+    Returns the number of segments backfilled.
+    """
+    backfilled = backfill_missing(embedding_set)
+    with transaction.atomic():
+        # Lock the sets so concurrent cutovers serialize
+        list(EmbeddingSet.objects.select_for_update().all())
+        backfilled += backfill_missing(embedding_set)
+        EmbeddingSet.objects.filter(is_active=True).exclude(id=embedding_set.id).update(is_active=False)
+        EmbeddingSet.objects.filter(id=embedding_set.id).update(
+            is_active=True, status="ready", activated_at=timezone.now()
+        )
+    active_embedding_set(refresh=True)
+    return backfilled
@@ -0,0 +1,133 @@
+from __future__ import annotations
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .embedding_sets import segment_vectors
+from .models import Video
+from .shards import VectorShard, open_shard
+
+# Rows scored between staleness checks, so a superseded query stops within ~1 ms
+SCORE_BLOCK_ROWS = 32768
+
+_matrix_cache: "OrderedDict[tuple[int, str, int], SegmentMatrix]" = OrderedDict()
+_matrix_cache_bytes = 0
+_matrix_lock = threading.Lock()
+
+
+class SegmentMatrix:
+    """
+    A video's segments with their L2-normalized vectors stacked into one float32
+    matrix, either read from the database or mapped from the video's vector shard.
+    """
+
+    def __init__(self, segment_ids: np.ndarray, start_sec: np.ndarray, vectors: np.ndarray, texts, heap_bytes: int):
+        self.segment_ids = segment_ids
+        self.start_sec = start_sec
+        self.vectors = vectors
+        # A list, or a VectorShard whose pages belong to the OS page cache
+        self._texts = texts
+        self.nbytes = heap_bytes
+        self._row = {int(sid): i for i, sid in enumerate(segment_ids)}
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Dict]) -> "SegmentMatrix":
+        segment_ids = np.asarray([r["id"] for r in rows], dtype=np.int64)
+        start_sec = np.asarray([r["start_sec"] for r in rows], dtype=np.float64)
+        texts = [r["text"] for r in rows]
+        if rows:
+            vectors = np.asarray([r["embedding"] for r in rows], dtype=np.float32).reshape(len(rows), -1)
+        else:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+        heap = vectors.nbytes + segment_ids.nbytes + start_sec.nbytes + sum(len(t) for t in texts)
+        return cls(segment_ids, start_sec, vectors, texts, heap)
+
+    @classmethod
+    def from_shard(cls, shard: VectorShard) -> "SegmentMatrix":
+        # Only the id -> row map lives on the heap
+        return cls(shard.segment_ids, shard.start_sec, shard.vectors, shard, 64 * len(shard))
+
+    def __len__(self) -> int:
+        return len(self.segment_ids)
+
+    def text(self, row: int) -> str:
+        if isinstance(self._texts, VectorShard):
+            return self._texts.text(row)
+        return self._texts[row]
+
+    def row(self, segment_id: int) -> Optional[int]:
+        return self._row.get(int(segment_id))
+
+
+def load_matrix(video: Video, fingerprint: str) -> SegmentMatrix:
+    """
+    The video's segment matrix for the active embedding set, kept hot in a
+    per-process LRU bounded by SEARCH_MATRIX_CACHE_MB. Keyed by index_version,
+    so a re-index or re-embed cutover loads a fresh one. Read from the video's
+    vector shard when a current one exists, else from the database.
+    """
+    global _matrix_cache_bytes
+    key = (video.id, fingerprint, video.index_version)
+    with _matrix_lock:
+        m = _matrix_cache.get(key)
+        if m is not None:
+            _matrix_cache.move_to_end(key)
+            return m
+
+    shard = open_shard(video.id, video.index_version, fingerprint)
+    m = SegmentMatrix.from_shard(shard) if shard is not None else SegmentMatrix.from_rows(segment_vectors(video.id))
+
+    budget = int(os.getenv("SEARCH_MATRIX_CACHE_MB", "256")) * 1024 * 1024
+    with _matrix_lock:
+        if key not in _matrix_cache:
+            _matrix_cache[key] = m
+            _matrix_cache_bytes += m.nbytes
+        while _matrix_cache_bytes > budget and len(_matrix_cache) > 1:
+            _, old = _matrix_cache.popitem(last=False)
+            _matrix_cache_bytes -= old.nbytes
+    return m
+
+
+def rank(
+    m: SegmentMatrix,
+    qvec: Sequence[float],
+    k: int,
+    is_stale: Optional[Callable[[], bool]] = None,
+) -> Optional[List[Tuple[int, float]]]:
+    """
+    Top-k (row, cosine) pairs for qvec, best first. Scores SCORE_BLOCK_ROWS rows
+    at a time and returns None as soon as is_stale() says a newer query arrived.
+    """
+    if not len(m):
+        return []
+    q = np.asarray(qvec, dtype=np.float32)
+    norm = float(np.linalg.norm(q))
+    if norm == 0:
+        return []
+    q = q / norm
+    scores = np.empty(len(m), dtype=np.float32)
+    for i in range(0, len(m), SCORE_BLOCK_ROWS):
+        if is_stale is not None and is_stale():
+            return None
+        np.dot(m.vectors[i:i + SCORE_BLOCK_ROWS], q, out=scores[i:i + SCORE_BLOCK_ROWS])
+    k = max(1, min(k, len(m)))
+    top = np.argpartition(-scores, k - 1)[:k] if k < len(m) else np.arange(len(m))
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return [(int(i), float(scores[i])) for i in top]
+
+
+def rescore(vectors: np.ndarray, qvec: Sequence[float]) -> List[Tuple[int, float]]:
+    """Exact (position, cosine) pairs for a few stored (normalized) vectors, best first."""
+    q = np.asarray(qvec, dtype=np.float32)
+    norm = float(np.linalg.norm(q))
+    if norm == 0 or not len(vectors):
+        return [(i, 0.0) for i in range(len(vectors))]
+    scores = np.asarray(vectors, dtype=np.float32) @ (q / norm)
+    order = np.argsort(-scores, kind="stable")
+    return [(int(i), float(scores[i])) for i in order]
@@ -0,0 +1,77 @@
+from __future__ import annotations
+import os
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from videos.utils.ffmpeg import extract_audio
+from videos.utils.scheduler import get_core_budget
+from videos.utils.transcription import get_whisper_model, transcribe
+
+
+def _wav_seconds(path: Path) -> float:
+    with wave.open(str(path), "rb") as w:
+        return w.getnframes() / float(w.getframerate())
+
+
+class Command(BaseCommand):
+    help = "Measure Whisper real-time factor (seconds of compute per second of audio) per decoding mode."
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="+", help="Audio or video files (anything ffmpeg reads; .wav is used as is)")
+        parser.add_argument("--batch-sizes", default="4,8,16", help="Comma-separated batch sizes for batched mode")
+        parser.add_argument("--no-sequential", action="store_true", help="Skip the sequential baseline")
+        parser.add_argument("--repeat", type=int, default=1, help="Timed runs per mode; the best is reported")
+
+    def handle(self, *args, **opts):
+        batch_sizes = [int(x) for x in opts["batch_sizes"].split(",") if x.strip()]
+        model_size = os.getenv("WHISPER_MODEL", "small")
+        t0 = time.perf_counter()
+        get_whisper_model(model_size)
+        threads = int(os.getenv("WHISPER_CPU_THREADS", "0") or 0) or get_core_budget().threads_per_job
+        self.stdout.write(
+            f"Model {os.getenv('WHISPER_MODEL_PATH') or model_size} loaded in {time.perf_counter() - t0:.1f}s "
+            f"(device {os.getenv('WHISPER_DEVICE', 'cpu')}, compute {os.getenv('WHISPER_COMPUTE_TYPE', 'float32')}, "
+            f"{threads} cpu threads)"
+        )
+
+        with tempfile.TemporaryDirectory(prefix="benchwhisper-") as tmp:
+            for src in opts["files"]:
+                path = Path(src).expanduser()
+                if not path.is_file():
+                    raise CommandError(f"not a file: {path}")
+                wav = path
+                if path.suffix.lower() != ".wav":
+                    wav = Path(tmp) / f"{path.stem}.wav"
+                    extract_audio(path, wav, sample_rate=16000)
+                audio_sec = _wav_seconds(wav)
+                self.stdout.write(f"\n{path.name}: {audio_sec:.1f}s of audio")
+                self.stdout.write(f"{'mode':<24} {'seconds':>9} {'rtf':>7} {'x realtime':>11} {'segments':>9} {'language':>9}")
+
+                def run(label: str, **kwargs):
+                    best = float("inf")
+                    for _ in range(max(1, opts["repeat"])):
+                        t = time.perf_counter()
+                        segments, info = transcribe(str(wav), model_size=model_size, **kwargs)
+                        best = min(best, time.perf_counter() - t)
+                    rtf = best / audio_sec if audio_sec else 0.0
+                    self.stdout.write(
+                        f"{label:<24} {best:>9.2f} {rtf:>7.3f} {1 / rtf if rtf else 0.0:>10.1f}x "
+                        f"{len(segments):>9} {info['language'] or '-':>9}"
+                    )
+                    return info
+
+                # Once with detection, as on a video's first run; every later row reuses
+                # the detected language, as re-runs do
+                info = run("sequential+detect", batched=False)
+                language = info["language"]
+                if not opts["no_sequential"]:
+                    run("sequential", batched=False, language=language)
+                for bs in batch_sizes:
+                    info = run(f"batched (batch {bs})", batched=True, batch_size=bs, language=language)
+                    if info["mode"] != "batched":
+                        self.stdout.write("Batched mode unavailable (needs faster-whisper >= 1.1)")
+                        break
@@ -0,0 +1,52 @@
+from __future__ import annotations
+import time
+from typing import Iterator, List
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from videos.models import Video
+from videos.segment_writer import SegmentRow, replace_video_segments
+
+
+def synthetic_rows(vecs: np.ndarray) -> Iterator[SegmentRow]:
+    for i, v in enumerate(vecs):
+        yield (f"synthetic segment {i} " + "lorem ipsum " * 12, i * 15.0, i * 15.0 + 15.0, v.tolist())
+
+
+class Command(BaseCommand):
+    help = "Benchmark TranscriptSegment indexing: bulk_create vs COPY (binary and csv) at several sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", default="1000,10000,100000", help="Comma-separated row counts")
+        parser.add_argument("--dim", type=int, default=384)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--repeat", type=int, default=1)
+
+    def handle(self, *args, **opts):
+        sizes = [int(x) for x in opts["rows"].split(",") if x.strip()]
+        methods: List[str] = ["bulk_create"]
+        if connection.vendor == "postgresql":
+            methods += ["copy_binary", "copy_csv"]
+        else:
+            self.stdout.write(f"COPY needs PostgreSQL (database vendor is {connection.vendor}); timing bulk_create only")
+
+        rng = np.random.default_rng(0)
+        video = Video.objects.create(title="benchwriter", status="error")
+        try:
+            self.stdout.write(f"{'rows':>8} {'method':<12} {'seconds':>9} {'rows/s':>10}")
+            for n in sizes:
+                vecs = rng.standard_normal((n, opts["dim"]), dtype=np.float32)
+                vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+                for method in methods:
+                    best = float("inf")
+                    for _ in range(max(1, opts["repeat"])):
+                        fmt = "orm" if method == "bulk_create" else method.removeprefix("copy_")
+                        t0 = time.perf_counter()
+                        # Same delete + write + id fetch transaction process_video runs
+                        replace_video_segments(video.id, synthetic_rows(vecs), opts["batch_size"], fmt=fmt)
+                        best = min(best, time.perf_counter() - t0)
+                    self.stdout.write(f"{n:>8} {method:<12} {best:>9.3f} {n / best:>10.0f}")
+        finally:
+            video.delete()
@@ -0,0 +1,248 @@
+from __future__ import annotations
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+
+# NOTE: keep this module free of model/service imports at import time. Pool workers
+# are spawned fresh and unpickle _process_one by reference before django.setup().
+
+LEDGER_NAME = ".scenequery-ingest.jsonl"
+_SAMPLE_BYTES = 1 << 20
+
+
+def file_fingerprint(path: Path) -> str:
+    """
+    Cheap content fingerprint: size plus the first and last MiB. Stable across
+    renames/moves, so a back catalog can be reorganized without re-ingesting.
+    """
+    size = path.stat().st_size
+    h = hashlib.sha256(str(size).encode("ascii"))
+    with open(path, "rb") as f:
+        h.update(f.read(_SAMPLE_BYTES))
+        if size > _SAMPLE_BYTES:
+            f.seek(max(_SAMPLE_BYTES, size - _SAMPLE_BYTES))
+            h.update(f.read(_SAMPLE_BYTES))
+    return h.hexdigest()
+
+
+def load_ledger(path: Path) -> Dict[str, Dict]:
+    """Latest ledger record per fingerprint. Tolerates a torn last line after a crash."""
+    records: Dict[str, Dict] = {}
+    if not path.exists():
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if rec.get("fingerprint"):
+                records[rec["fingerprint"]] = rec
+    return records
+
+
+def _init_worker(threads: int) -> None:
+    # Each worker process runs one job at a time with its share of the core budget
+    os.environ.update({
+        "CPU_CORE_BUDGET": str(threads),
+        "INTERACTIVE_RESERVED_CORES": "0",
+        "INGEST_MAX_CONCURRENCY": "1",
+    })
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "server.settings")
+    import django
+
+    django.setup()
+
+
+def _process_one(video_id: int, src: str) -> Tuple[int, float]:
+    """Runs in a pool worker: attach the source file to the Video and run the pipeline."""
+    from django.conf import settings
+    from django.core.files import File
+
+    from videos.models import Video
+    from videos.services import process_video
+
+    video = Video.objects.get(id=video_id)
+    if not video.file:
+        with open(src, "rb") as f:
+            video.file.save(Path(src).name, File(f), save=True)
+    t0 = time.perf_counter()
+    process_video(video.id, Path(settings.MEDIA_ROOT) / video.file.name)
+    return video.id, time.perf_counter() - t0
+
+
+class Command(BaseCommand):
+    help = "Bulk-ingest a directory of videos with a bounded process pool. Resumable via a checkpoint ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory")
+        parser.add_argument("--workers", type=int, default=2, help="Pipeline processes (each loads its own models)")
+        parser.add_argument("--probe-workers", type=int, default=8, help="Concurrent ffprobe/fingerprint threads")
+        parser.add_argument("--ledger", default=None, help=f"Checkpoint ledger path (default: <directory>/{LEDGER_NAME})")
+        parser.add_argument("--no-recursive", action="store_true", help="Only look at the top-level directory")
+        parser.add_argument("--max-duration", type=float, default=None, help="Skip files longer than this many seconds")
+        parser.add_argument("--retry-failed", action="store_true", help="Retry files the ledger marks as failed")
+        parser.add_argument("--dry-run", action="store_true", help="Discover and probe only")
+
+    def handle(self, *args, **opts):
+        from videos.models import Video
+        from videos.services import VIDEO_EXTENSIONS
+        from videos.utils.ffmpeg import get_duration_seconds
+        from videos.utils.scheduler import get_core_budget
+
+        root = Path(opts["directory"]).expanduser().resolve()
+        if not root.is_dir():
+            raise CommandError(f"not a directory: {root}")
+        ledger_path = Path(opts["ledger"]).expanduser() if opts["ledger"] else root / LEDGER_NAME
+
+        pattern = "*" if opts["no_recursive"] else "**/*"
+        files = sorted(
+            p for p in root.glob(pattern)
+            if p.is_file() and p.suffix.lower() in VIDEO_EXTENSIONS
+        )
+        self.stdout.write(f"Discovered {len(files)} media files under {root}")
+        if not files:
+            return
+
+        ledger = load_ledger(ledger_path)
+        # A "done" record only counts while its video still exists and is ready
+        ready_ids = set(Video.objects.filter(
+            id__in=[r.get("video_id") for r in ledger.values() if r.get("status") == "done" and r.get("video_id")],
+            status="ready",
+        ).values_list("id", flat=True))
+
+        def _ingested(rec: Optional[Dict]) -> bool:
+            return bool(rec) and rec.get("status") == "done" and rec.get("video_id") in ready_ids
+
+        def _probe(path: Path) -> Tuple[Path, str, Optional[float], Optional[str]]:
+            try:
+                fp = file_fingerprint(path)
+            except OSError as e:
+                return path, "", None, f"read failed: {e}"
+            rec = ledger.get(fp)
+            if _ingested(rec) or (rec and rec.get("status") == "failed" and not opts["retry_failed"]):
+                return path, fp, rec.get("duration"), None
+            try:
+                return path, fp, get_duration_seconds(path), None
+            except Exception as e:
+                return path, fp, None, str(e)
+
+        t_probe = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, opts["probe_workers"])) as pool:
+            probed = list(pool.map(_probe, files))
+        self.stdout.write(f"Probed {len(probed)} files in {time.perf_counter() - t_probe:.1f}s")
+
+        todo: List[Tuple[Path, str, float, Optional[int]]] = []
+        skipped = 0
+        seen: set[str] = set()
+        for path, fp, duration, err in probed:
+            if err:
+                self.stderr.write(f"  skip {path}: {err}")
+                skipped += 1
+                continue
+            if fp in seen:
+                self.stdout.write(f"  skip {path}: duplicate content")
+                skipped += 1
+                continue
+            seen.add(fp)
+            rec = ledger.get(fp)
+            if _ingested(rec):
+                skipped += 1
+                continue
+            if rec and rec.get("status") == "failed" and not opts["retry_failed"]:
+                skipped += 1
+                continue
+            if opts["max_duration"] is not None and duration > opts["max_duration"]:
+                self.stdout.write(f"  skip {path}: {duration:.0f}s > --max-duration")
+                skipped += 1
+                continue
+            # "started" means a previous run crashed mid-pipeline; reuse its Video (and file)
+            # rather than creating a duplicate. Same for failures being retried and for
+            # "done" videos that are no longer ready. Deleted videos are ingested afresh.
+            resume_id = rec.get("video_id") if rec else None
+            if resume_id and not Video.objects.filter(id=resume_id).exists():
+                resume_id = None
+            todo.append((path, fp, float(duration), resume_id))
+
+        self.stdout.write(f"{len(todo)} to ingest, {skipped} skipped")
+        if opts["dry_run"] or not todo:
+            return
+
+        def _append(rec: Dict) -> None:
+            rec["ts"] = time.time()
+            with open(ledger_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+        done = failed = 0
+        audio_sec = 0.0
+        t0 = time.perf_counter()
+        ctx = multiprocessing.get_context("spawn")
+        budget = get_core_budget()
+        workers = max(1, min(opts["workers"], budget.ingest_cores))
+        threads = max(1, budget.ingest_cores // workers)
+        self.stdout.write(f"{workers} workers x {threads} threads ({budget.ingest_cores} of {budget.total} cores for ingest)")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(threads,)) as pool:
+            pending = {}
+            queue = iter(todo)
+
+            def _submit_next() -> bool:
+                # Videos and "started" records are created as jobs are handed to a worker,
+                # so a crash leaves at most `workers` of them half-processed (and resumable)
+                item = next(queue, None)
+                if item is None:
+                    return False
+                path, fp, duration, resume_id = item
+                if resume_id:
+                    video = Video.objects.get(id=resume_id)
+                    video.status = "processing"
+                    video.save(update_fields=["status"])
+                else:
+                    video = Video.objects.create(title=path.stem, duration_sec=duration, status="processing")
+                _append({"fingerprint": fp, "path": str(path), "status": "started", "video_id": video.id, "duration": duration})
+                fut = pool.submit(_process_one, video.id, str(path))
+                pending[fut] = (path, fp, duration, video.id)
+                return True
+
+            try:
+                while len(pending) < workers and _submit_next():
+                    pass
+
+                while pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        path, fp, duration, video_id = pending.pop(fut)
+                        try:
+                            _, elapsed = fut.result()
+                        except Exception as e:
+                            failed += 1
+                            _append({"fingerprint": fp, "path": str(path), "status": "failed", "video_id": video_id, "duration": duration, "error": str(e)})
+                            self.stderr.write(f"  FAIL v{video_id} {path.name}: {e}")
+                            continue
+                        done += 1
+                        audio_sec += duration
+                        _append({"fingerprint": fp, "path": str(path), "status": "done", "video_id": video_id, "duration": duration})
+                        self.stdout.write(
+                            f"  ok   v{video_id} {path.name} ({duration:.0f}s audio in {elapsed:.1f}s) "
+                            f"[{done + failed}/{len(todo)}]"
+                        )
+                    while len(pending) < workers and _submit_next():
+                        pass
+            except KeyboardInterrupt:
+                pool.shutdown(wait=False, cancel_futures=True)
+                self.stderr.write("Interrupted; re-run the same command to resume from the ledger.")
+                raise
+
+        wall = time.perf_counter() - t0
+        self.stdout.write(self.style.SUCCESS(
+            f"Ingested {done} videos ({failed} failed, {skipped} skipped) in {wall:.1f}s: "
+            f"{done / wall * 60:.2f} videos/min, {audio_sec / wall:.2f} audio-seconds/sec"
+        ))
@@ -0,0 +1,126 @@
+from __future__ import annotations
+from typing import Dict, List
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from videos.embedding_sets import active_fingerprint, active_model_name, segment_vectors
+from videos.models import QuantizedIndex, Video
+from videos.quantized import build_quantized_index, quantization_scheme
+from videos.utils.embeddings import embed_texts
+from videos.utils.quantization import SCHEMES, bytes_per_segment, candidates, quantize
+
+
+class Command(BaseCommand):
+    help = (
+        "Build quantized search indexes for ready videos (e.g. after enabling SEARCH_QUANTIZATION "
+        "or a reembed cutover) and/or report recall@k and memory per segment against exact cosine."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--video", type=int, action="append", help="Limit to these video ids")
+        parser.add_argument("--scheme", choices=SCHEMES, help="Defaults to SEARCH_QUANTIZATION")
+        parser.add_argument("--rebuild", action="store_true", help="Rebuild even if a current index exists")
+        parser.add_argument("--eval", action="store_true", help="Report recall@k for every scheme instead of building")
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--candidates", type=int, default=100, help="First-pass candidates rescored exactly")
+        parser.add_argument("--queries", type=int, default=50, help="Synthetic queries per video")
+        parser.add_argument("--queries-file", help="Text file with one query per line (embedded with the active model)")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **opts):
+        videos = Video.objects.filter(status="ready").order_by("id")
+        if opts["video"]:
+            videos = videos.filter(id__in=opts["video"])
+        if opts["eval"]:
+            self._eval(list(videos), opts)
+        else:
+            self._build(list(videos), opts)
+
+    def _build(self, videos: List[Video], opts: Dict) -> None:
+        scheme = opts["scheme"] or quantization_scheme()
+        if not scheme:
+            raise CommandError("No scheme: pass --scheme or set SEARCH_QUANTIZATION")
+        fingerprint = active_fingerprint()
+        built = skipped = 0
+        for video in videos:
+            current = QuantizedIndex.objects.filter(
+                video=video, fingerprint=fingerprint, index_version=video.index_version, scheme=scheme
+            ).exists()
+            if current and not opts["rebuild"]:
+                skipped += 1
+                continue
+            rows = segment_vectors(video.id, fields=("id",))
+            if not rows:
+                skipped += 1
+                continue
+            qi = build_quantized_index(
+                video.id, video.index_version, fingerprint,
+                [r["id"] for r in rows], [r["embedding"] for r in rows], scheme,
+            )
+            built += 1
+            self.stdout.write(f"  v{video.id}: {qi.count} segments, {scheme}")
+        self.stdout.write(self.style.SUCCESS(f"Built {built} quantized indexes ({skipped} skipped)"))
+
+    def _eval(self, videos: List[Video], opts: Dict) -> None:
+        k = opts["k"]
+        n_cand = max(k, opts["candidates"])
+        rng = np.random.default_rng(opts["seed"])
+        text_queries = None
+        if opts["queries_file"]:
+            with open(opts["queries_file"], "r", encoding="utf-8") as f:
+                lines = [ln.strip() for ln in f if ln.strip()]
+            text_queries = np.asarray(embed_texts(lines, model_name=active_model_name()), dtype=np.float32)
+
+        hits = {s: {"first": 0, "rescored": 0} for s in SCHEMES}
+        total = 0
+        dim = 0
+        n_segments = 0
+        for video in videos:
+            rows = segment_vectors(video.id, fields=("id",))
+            if len(rows) <= k:
+                continue
+            ids = np.array([r["id"] for r in rows], dtype=np.int64)
+            mat = np.asarray([r["embedding"] for r in rows], dtype=np.float32)
+            norms = np.linalg.norm(mat, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            unit = mat / norms
+            dim = mat.shape[1]
+            n_segments += len(rows)
+            if text_queries is not None:
+                queries = text_queries
+            else:
+                # Synthetic queries: midpoints of random segment pairs, so the
+                # nearest neighbours are not trivially the segment itself
+                a = rng.integers(0, len(rows), opts["queries"])
+                b = rng.integers(0, len(rows), opts["queries"])
+                queries = unit[a] + unit[b]
+                queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+            index_of = {int(sid): i for i, sid in enumerate(ids)}
+            codes_by_scheme = {s: quantize(mat, ids, s) for s in SCHEMES}
+            for q in queries:
+                exact = unit @ q
+                truth = set(ids[np.argsort(-exact)[:k]].tolist())
+                total += 1
+                for scheme, codes in codes_by_scheme.items():
+                    cand = candidates(codes, q, scheme, n_cand)
+                    hits[scheme]["first"] += len(truth & set(cand[:k].tolist()))
+                    rows_idx = np.array([index_of[int(c)] for c in cand])
+                    rescored = cand[np.argsort(-exact[rows_idx])[:k]]
+                    hits[scheme]["rescored"] += len(truth & set(rescored.tolist()))
+
+        if not total:
+            raise CommandError(f"No ready video has more than k={k} segments")
+        self.stdout.write(
+            f"{len(videos)} videos, {n_segments} segments, dim={dim}, {total} queries, "
+            f"k={k}, {n_cand} candidates rescored"
+        )
+        self.stdout.write(f"{'scheme':<12} {'bytes/seg':>9} {'vs f32':>7} {'recall@k 1st':>13} {'recall@k rescored':>18}")
+        f32 = bytes_per_segment(dim, "float32")
+        self.stdout.write(f"{'float32':<12} {f32:>9.0f} {1.0:>6.1f}x {1.0:>13.4f} {1.0:>18.4f}")
+        for scheme in SCHEMES:
+            size = bytes_per_segment(dim, scheme)
+            self.stdout.write(
+                f"{scheme:<12} {size:>9.0f} {f32 / size:>6.1f}x "
+                f"{hits[scheme]['first'] / (total * k):>13.4f} {hits[scheme]['rescored'] / (total * k):>18.4f}"
+            )
@@ -0,0 +1,109 @@
+from __future__ import annotations
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from videos.embedding_sets import activate_embedding_set, write_segment_embeddings
+from videos.models import EmbeddingSet, SegmentEmbedding, TranscriptSegment
+from videos.utils.embeddings import embed_texts, get_model, model_fingerprint
+
+
+def _fetch_page(cursor: int, batch_size: int) -> List[Tuple[int, str]]:
+    return list(
+        TranscriptSegment.objects.filter(id__gt=cursor)
+        .order_by("id")
+        .values_list("id", "text")[:batch_size]
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Build a new embedding set for every transcript segment with another model while "
+        "search keeps serving the active one, then atomically switch to it. Resumable."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", help="Embedding model name or local directory for the new set")
+        parser.add_argument("--batch-size", type=int, default=4096, help="Segments fetched and written per page")
+        parser.add_argument("--encode-batch-size", type=int, default=256, help="Batch size passed to the encoder")
+        parser.add_argument("--no-activate", action="store_true", help="Build the set but keep serving the current one")
+        parser.add_argument("--activate-only", action="store_true", help="Skip building; backfill gaps and switch")
+        parser.add_argument("--list", action="store_true", help="List embedding sets and exit")
+
+    def handle(self, *args, **opts):
+        if opts["list"]:
+            for es in EmbeddingSet.objects.order_by("id"):
+                n = SegmentEmbedding.objects.filter(embedding_set=es).count()
+                flag = "*" if es.is_active else " "
+                self.stdout.write(f"{flag} {es.id:>3} {es.fingerprint} {es.status:<8} dim={es.dim:<4} n={n:<9} {es.model_name}")
+            return
+        model_name = opts["model"]
+        if not model_name:
+            raise CommandError("--model is required")
+
+        fingerprint = model_fingerprint(model_name)
+        es, created = EmbeddingSet.objects.get_or_create(
+            fingerprint=fingerprint, defaults={"model_name": model_name}
+        )
+        if es.is_active and not opts["activate_only"]:
+            self.stdout.write(f"Embedding set {es.id} ({model_name}) is already active; nothing to do.")
+            return
+        self.stdout.write(f"{'Created' if created else 'Resuming'} embedding set {es.id} ({model_name}, {fingerprint})")
+
+        if not opts["activate_only"]:
+            self._build(es, opts["batch_size"], opts["encode_batch_size"])
+
+        if opts["no_activate"]:
+            self.stdout.write("Built; not activated (--no-activate).")
+            return
+        t0 = time.perf_counter()
+        backfilled = activate_embedding_set(es)
+        self.stdout.write(self.style.SUCCESS(
+            f"Activated embedding set {es.id} ({backfilled} segments backfilled, cutover {time.perf_counter() - t0:.2f}s)"
+        ))
+
+    def _build(self, es: EmbeddingSet, batch_size: int, encode_batch_size: int) -> None:
+        t_load = time.perf_counter()
+        get_model(es.model_name)
+        self.stdout.write(f"Model loaded in {time.perf_counter() - t_load:.1f}s")
+
+        # Keyset resume point: pages are written in id order, each in its own
+        # transaction, so everything at or below the max written id is done.
+        cursor = SegmentEmbedding.objects.filter(embedding_set=es).aggregate(m=Max("segment_id"))["m"] or 0
+        remaining = TranscriptSegment.objects.filter(id__gt=cursor).count()
+        self.stdout.write(f"Starting after segment id {cursor}; {remaining} segments to embed")
+
+        done = 0
+        t0 = time.perf_counter()
+        # Fetch the next page while the current one is being encoded
+        with ThreadPoolExecutor(max_workers=1) as prefetch:
+            page = prefetch.submit(_fetch_page, cursor, batch_size)
+            while True:
+                rows = page.result()
+                if not rows:
+                    break
+                cursor = rows[-1][0]
+                page = prefetch.submit(_fetch_page, cursor, batch_size)
+
+                vecs = embed_texts([t for _, t in rows], model_name=es.model_name, batch_size=encode_batch_size)
+                with transaction.atomic():
+                    write_segment_embeddings(es.id, [i for i, _ in rows], vecs)
+                    if not es.dim and vecs:
+                        es.dim = len(vecs[0])
+                        es.save(update_fields=["dim"])
+
+                done += len(rows)
+                elapsed = time.perf_counter() - t0
+                self.stdout.write(
+                    f"  {done}/{remaining} segments ({done / elapsed:.0f} seg/s), cursor={cursor}"
+                )
+
+        es.status = "ready"
+        es.save(update_fields=["status"])
+        elapsed = time.perf_counter() - t0
+        rate = done / elapsed if elapsed > 0 else 0.0
+        self.stdout.write(f"Embedded {done} segments in {elapsed:.1f}s ({rate:.0f} seg/s)")
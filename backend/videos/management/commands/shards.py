@@ -0,0 +1,47 @@
+from __future__ import annotations
+from django.core.management.base import BaseCommand
+
+from videos.embedding_sets import active_fingerprint, segment_vectors
+from videos.models import Video
+from videos.shards import open_shard, remove_shard, shard_dir, write_shard
+
+
+class Command(BaseCommand):
+    help = (
+        "Write memory-mapped vector shards for ready videos that lack a current one "
+        "(e.g. videos indexed before shards existed, or after a reembed cutover)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--video", type=int, action="append", help="Limit to these video ids")
+        parser.add_argument("--rebuild", action="store_true", help="Rewrite even if a current shard exists")
+        parser.add_argument("--prune", action="store_true", help="Also delete shards of videos that no longer exist")
+
+    def handle(self, *args, **opts):
+        videos = Video.objects.filter(status="ready").order_by("id")
+        if opts["video"]:
+            videos = videos.filter(id__in=opts["video"])
+        fingerprint = active_fingerprint()
+        built = skipped = 0
+        for video in videos:
+            if not opts["rebuild"] and open_shard(video.id, video.index_version, fingerprint) is not None:
+                skipped += 1
+                continue
+            rows = segment_vectors(video.id, fields=("id", "start_sec", "end_sec", "text"))
+            path = write_shard(
+                video.id, video.index_version, fingerprint,
+                [r["id"] for r in rows], [r["start_sec"] for r in rows], [r["end_sec"] for r in rows],
+                [r["text"] for r in rows], [r["embedding"] for r in rows],
+            )
+            built += 1
+            self.stdout.write(f"  v{video.id}: {len(rows)} segments, {path.stat().st_size / 1e6:.1f} MB")
+        self.stdout.write(self.style.SUCCESS(f"Wrote {built} vector shards ({skipped} already current)"))
+
+        if opts["prune"] and shard_dir().is_dir():
+            existing = set(Video.objects.values_list("id", flat=True))
+            pruned = 0
+            for path in shard_dir().glob("*.vshard"):
+                if path.stem.isdigit() and int(path.stem) not in existing:
+                    remove_shard(int(path.stem))
+                    pruned += 1
+            self.stdout.write(f"Pruned {pruned} shards of deleted videos")
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.8 on 2026-10-19 04:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0002_search_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddingSet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=255)),
+                ('fingerprint', models.CharField(max_length=32, unique=True)),
+                ('dim', models.PositiveIntegerField(default=0)),
+                ('status', models.CharField(choices=[('building', 'building'), ('ready', 'ready')], default='building', max_length=16)),
+                ('is_active', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('activated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SegmentEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vector', models.JSONField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='embeddingset',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('is_active',), name='single_active_embedding_set'),
+        ),
+        migrations.AddField(
+            model_name='segmentembedding',
+            name='embedding_set',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vectors', to='videos.embeddingset'),
+        ),
+        migrations.AddField(
+            model_name='segmentembedding',
+            name='segment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='embeddings', to='videos.transcriptsegment'),
+        ),
+        migrations.AddConstraint(
+            model_name='segmentembedding',
+            constraint=models.UniqueConstraint(fields=('embedding_set', 'segment'), name='unique_set_segment_embedding'),
+        ),
+    ]
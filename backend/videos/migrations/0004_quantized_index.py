@@ -0,0 +1,36 @@
+# Generated by Django 5.0.8 on 2026-10-19 04:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0003_embedding_sets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuantizedIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=32)),
+                ('index_version', models.PositiveIntegerField()),
+                ('scheme', models.CharField(max_length=16)),
+                ('dim', models.PositiveIntegerField()),
+                ('count', models.PositiveIntegerField()),
+                ('segment_ids', models.BinaryField()),
+                ('int8_codes', models.BinaryField(null=True)),
+                ('int8_scale', models.BinaryField(null=True)),
+                ('int8_offset', models.BinaryField(null=True)),
+                ('sign_bits', models.BinaryField(null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quantized_indexes', to='videos.video')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='quantizedindex',
+            constraint=models.UniqueConstraint(fields=('video', 'fingerprint'), name='unique_video_quantized_index'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.8 on 2026-10-19 05:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0004_quantized_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='language',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+    ]
@@ -13,6 +13,10 @@ class Video(models.Model):
     file = models.FileField(upload_to="videos/")
     duration_sec = models.FloatField(default=0.0)
     status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="processing")
+    # Bumped every time the transcript index is rebuilt; part of search cache keys/ETags
+    index_version = models.PositiveIntegerField(default=0)
+    # Spoken language detected on the first transcription; later runs reuse it
+    language = models.CharField(max_length=16, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self) -> str:
@@ -24,6 +28,8 @@ class TranscriptSegment(models.Model):
     text = models.TextField()
     start_sec = models.FloatField()
     end_sec = models.FloatField()
+    # Vectors of the model that was active when the video was indexed. Once an
+    # EmbeddingSet is active, SegmentEmbedding rows for that set are authoritative.
     embedding = models.JSONField()  # 384-dim list[float] for fallback; later swap to pgvector if available
 
     class Meta:
@@ -33,3 +39,90 @@ class TranscriptSegment(models.Model):
 
     def __str__(self) -> str:
         return f"Seg(v{self.video_id} {self.start_sec:.1f}-{self.end_sec:.1f}s)"
+
+
+class EmbeddingSet(models.Model):
+    """
+    One embedding model's vectors for the whole corpus. Exactly one set may be active;
+    while none is, search uses the configured EMBED_MODEL and TranscriptSegment.embedding.
+    """
+    STATUS_CHOICES = (
+        ("building", "building"),
+        ("ready", "ready"),
+    )
+
+    model_name = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=32, unique=True)
+    dim = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="building")
+    is_active = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    activated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["is_active"], condition=models.Q(is_active=True), name="single_active_embedding_set"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"EmbeddingSet({self.id}, {self.model_name}{', active' if self.is_active else ''})"
+
+
+class SegmentEmbedding(models.Model):
+    embedding_set = models.ForeignKey(EmbeddingSet, on_delete=models.CASCADE, related_name="vectors")
+    segment = models.ForeignKey(TranscriptSegment, on_delete=models.CASCADE, related_name="embeddings")
+    vector = models.JSONField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["embedding_set", "segment"], name="unique_set_segment_embedding"),
+        ]
+
+    def __str__(self) -> str:
+        return f"SegEmb(set{self.embedding_set_id} seg{self.segment_id})"
+
+
+class QuantizedIndex(models.Model):
+    """
+    Compressed per-video embedding codes for low-memory first-pass search
+    (see videos/utils/quantization.py). Valid only for the video's current
+    index_version and the embedding model it was built from.
+    """
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name="quantized_indexes")
+    fingerprint = models.CharField(max_length=32)
+    index_version = models.PositiveIntegerField()
+    scheme = models.CharField(max_length=16)
+    dim = models.PositiveIntegerField()
+    count = models.PositiveIntegerField()
+    segment_ids = models.BinaryField()  # int64[count]
+    int8_codes = models.BinaryField(null=True)  # int8[count, dim]
+    int8_scale = models.BinaryField(null=True)  # float32[dim]
+    int8_offset = models.BinaryField(null=True)  # float32[dim]
+    sign_bits = models.BinaryField(null=True)  # uint8[count, ceil(dim / 8)]
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["video", "fingerprint"], name="unique_video_quantized_index"),
+        ]
+
+    def __str__(self) -> str:
+        return f"QIndex(v{self.video_id} {self.scheme} n={self.count})"
+
+
+class SearchCacheEntry(models.Model):
+    """Cached search response for the database-backed search result cache."""
+    key = models.CharField(max_length=64, primary_key=True)
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name="search_cache_entries")
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"SearchCache(v{self.video_id} {self.key[:12]})"
@@ -0,0 +1,117 @@
+from __future__ import annotations
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from .models import QuantizedIndex, Video
+from .utils.quantization import SCHEMES, QuantizedCodes, candidates, quantize
+
+_codes_cache: "OrderedDict[tuple[int, str, int], QuantizedCodes]" = OrderedDict()
+_codes_cache_bytes = 0
+_codes_lock = threading.Lock()
+
+
+def quantization_scheme() -> Optional[str]:
+    """SEARCH_QUANTIZATION: none (default) | int8 | binary | binary+int8."""
+    scheme = os.getenv("SEARCH_QUANTIZATION", "none").lower()
+    return scheme if scheme in SCHEMES else None
+
+
+def rescore_candidates(k: int) -> int:
+    return max(k, int(os.getenv("SEARCH_RESCORE_CANDIDATES", "100")))
+
+
+def build_quantized_index(
+    video_id: int,
+    index_version: int,
+    fingerprint: str,
+    segment_ids: Sequence[int],
+    vectors: Sequence[List[float]],
+    scheme: str,
+) -> QuantizedIndex:
+    codes = quantize(np.asarray(vectors, dtype=np.float32).reshape(len(segment_ids), -1), np.asarray(segment_ids), scheme)
+
+    def _blob(a):
+        return None if a is None else np.ascontiguousarray(a).tobytes()
+
+    qi, _ = QuantizedIndex.objects.update_or_create(
+        video_id=video_id,
+        fingerprint=fingerprint,
+        defaults={
+            "index_version": index_version,
+            "scheme": scheme,
+            "dim": codes.dim,
+            "count": len(segment_ids),
+            "segment_ids": _blob(codes.segment_ids),
+            "int8_codes": _blob(codes.int8_codes),
+            "int8_scale": _blob(codes.int8_scale),
+            "int8_offset": _blob(codes.int8_offset),
+            "sign_bits": _blob(codes.sign_bits),
+        },
+    )
+    return qi
+
+
+def _decode(qi: QuantizedIndex) -> QuantizedCodes:
+    def _arr(blob, dtype, shape=None):
+        if blob is None:
+            return None
+        a = np.frombuffer(bytes(blob), dtype=dtype)
+        return a.reshape(shape) if shape is not None else a
+
+    return QuantizedCodes(
+        segment_ids=_arr(qi.segment_ids, np.int64),
+        dim=qi.dim,
+        int8_codes=_arr(qi.int8_codes, np.int8, (qi.count, qi.dim)),
+        int8_scale=_arr(qi.int8_scale, np.float32),
+        int8_offset=_arr(qi.int8_offset, np.float32),
+        sign_bits=_arr(qi.sign_bits, np.uint8, (qi.count, (qi.dim + 7) // 8)),
+    )
+
+
+def load_codes(video: Video, fingerprint: str, scheme: str) -> Optional[QuantizedCodes]:
+    """
+    Quantized codes for the video's current index, kept hot in a per-process LRU
+    bounded by SEARCH_INDEX_CACHE_MB. None if missing, stale or built for another scheme.
+    """
+    global _codes_cache_bytes
+    key = (video.id, fingerprint, video.index_version)
+    with _codes_lock:
+        codes = _codes_cache.get(key)
+        if codes is not None:
+            _codes_cache.move_to_end(key)
+            return codes
+
+    qi = QuantizedIndex.objects.filter(
+        video_id=video.id, fingerprint=fingerprint, index_version=video.index_version, scheme=scheme
+    ).first()
+    if qi is None:
+        return None
+    codes = _decode(qi)
+
+    budget = int(os.getenv("SEARCH_INDEX_CACHE_MB", "256")) * 1024 * 1024
+    with _codes_lock:
+        if key not in _codes_cache:
+            _codes_cache[key] = codes
+            _codes_cache_bytes += codes.nbytes
+        while _codes_cache_bytes > budget and len(_codes_cache) > 1:
+            _, old = _codes_cache.popitem(last=False)
+            _codes_cache_bytes -= old.nbytes
+    return codes
+
+
+def quantized_candidates(video: Video, fingerprint: str, qvec: Sequence[float], k: int) -> Optional[List[int]]:
+    """
+    First-pass candidate segment ids from the quantized index, or None when
+    quantization is off or no current index exists (caller falls back to exact search).
+    """
+    scheme = quantization_scheme()
+    if scheme is None:
+        return None
+    codes = load_codes(video, fingerprint, scheme)
+    if codes is None:
+        return None
+    return candidates(codes, qvec, scheme, rescore_candidates(k)).tolist()
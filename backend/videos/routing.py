@@ -4,4 +4,5 @@ from . import consumers
 websocket_urlpatterns = [
     re_path(r"^ws/videos/(?P<video_id>\d+)/progress/$", consumers.VideoProgressConsumer.as_asgi()),
     re_path(r"^ws/videos/(?P<video_id>\d+)/chat/$", consumers.VideoChatConsumer.as_asgi()),
+    re_path(r"^ws/videos/(?P<video_id>\d+)/search/$", consumers.VideoSearchConsumer.as_asgi()),
 ]
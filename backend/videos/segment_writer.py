@@ -0,0 +1,141 @@
+from __future__ import annotations
+import csv
+import io
+import os
+import struct
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from django.db import connection, transaction
+
+from .models import TranscriptSegment
+
+# (text, start_sec, end_sec, embedding)
+SegmentRow = Tuple[str, float, float, Sequence[float]]
+
+_PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_PGCOPY_TRAILER = struct.pack(">h", -1)
+_FIELDS = ("video", "text", "start_sec", "end_sec", "embedding")
+
+
+def _batches(rows: Iterable[SegmentRow], size: int) -> Iterator[List[SegmentRow]]:
+    it = iter(rows)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+_vector_formats: dict[int, str] = {}
+
+
+def json_vector(emb: Sequence[float]) -> bytes:
+    """
+    JSON array text for an embedding. %.9g round-trips float32 exactly (embeddings
+    come out of the encoder as float32), is ~2x faster than json.dumps and ~40%
+    shorter, which also cuts server-side jsonb parsing.
+    """
+    fmt = _vector_formats.get(len(emb))
+    if fmt is None:
+        fmt = _vector_formats.setdefault(len(emb), "[" + ",".join(["%.9g"] * len(emb)) + "]")
+    return (fmt % tuple(emb)).encode("ascii")
+
+
+def encode_binary(video_id: int, rows: Sequence[SegmentRow]) -> bytes:
+    """Rows in PostgreSQL's binary COPY format (bigint, text, float8, float8, jsonb)."""
+    buf = io.BytesIO()
+    buf.write(_PGCOPY_HEADER)
+    vid = struct.pack(">hiq", len(_FIELDS), 8, video_id)
+    for text, start, end, emb in rows:
+        t = text.encode("utf-8")
+        # jsonb binary input is a version byte followed by the JSON text
+        j = b"\x01" + json_vector(emb)
+        buf.write(vid)
+        buf.write(struct.pack(">i", len(t)))
+        buf.write(t)
+        buf.write(struct.pack(">idid", 8, float(start), 8, float(end)))
+        buf.write(struct.pack(">i", len(j)))
+        buf.write(j)
+    buf.write(_PGCOPY_TRAILER)
+    return buf.getvalue()
+
+
+def encode_csv(video_id: int, rows: Sequence[SegmentRow]) -> bytes:
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    for text, start, end, emb in rows:
+        w.writerow([video_id, text, repr(float(start)), repr(float(end)), json_vector(emb).decode("ascii")])
+    return buf.getvalue().encode("utf-8")
+
+
+def _copy(cursor, sql: str, payload: bytes) -> None:
+    raw = cursor.cursor  # unwrap Django's CursorWrapper
+    if hasattr(raw, "copy_expert"):  # psycopg2
+        raw.copy_expert(sql, io.BytesIO(payload))
+    else:  # psycopg 3
+        with raw.copy(sql) as copy:
+            copy.write(payload)
+
+
+def copy_available() -> bool:
+    return connection.vendor == "postgresql" and os.getenv("SEGMENT_WRITER", "copy").lower() != "orm"
+
+
+def copy_segments(video_id: int, rows: Iterable[SegmentRow], batch_size: int, fmt: str = "binary") -> int:
+    """COPY rows into the segment table in bounded batches. Must run inside a transaction."""
+    table = connection.ops.quote_name(TranscriptSegment._meta.db_table)
+    cols = ", ".join(connection.ops.quote_name(TranscriptSegment._meta.get_field(f).column) for f in _FIELDS)
+    if fmt == "binary":
+        sql = f"COPY {table} ({cols}) FROM STDIN WITH (FORMAT binary)"
+        encode = encode_binary
+    else:
+        sql = f"COPY {table} ({cols}) FROM STDIN WITH (FORMAT csv)"
+        encode = encode_csv
+    n = 0
+    with connection.cursor() as cursor:
+        for batch in _batches(rows, batch_size):
+            _copy(cursor, sql, encode(video_id, batch))
+            n += len(batch)
+    return n
+
+
+def orm_segments(video_id: int, rows: Iterable[SegmentRow], batch_size: int) -> int:
+    n = 0
+    for batch in _batches(rows, batch_size):
+        TranscriptSegment.objects.bulk_create([
+            TranscriptSegment(video_id=video_id, text=text, start_sec=float(start), end_sec=float(end), embedding=list(emb))
+            for text, start, end, emb in batch
+        ])
+        n += len(batch)
+    return n
+
+
+def replace_video_segments(
+    video_id: int,
+    rows: Iterable[SegmentRow],
+    batch_size: Optional[int] = None,
+    fmt: Optional[str] = None,
+) -> List[int]:
+    """
+    Atomically swap a video's transcript segments for `rows`, streaming them with
+    COPY ... FROM STDIN on PostgreSQL (bulk_create elsewhere, or with SEGMENT_WRITER=orm)
+    in batches of SEGMENT_WRITE_BATCH rows, so memory stays bounded by one batch.
+    fmt overrides the method: "binary" | "csv" (COPY) or "orm" (bulk_create).
+    Old rows disappear only when the surrounding transaction commits.
+    Returns the new segment ids in input order.
+    """
+    batch_size = batch_size or int(os.getenv("SEGMENT_WRITE_BATCH", "5000"))
+    if fmt is None:
+        fmt = os.getenv("SEGMENT_COPY_FORMAT", "binary").lower() if copy_available() else "orm"
+    with transaction.atomic():
+        # only("id"): the delete collector would otherwise load and JSON-decode every old embedding
+        TranscriptSegment.objects.filter(video_id=video_id).only("id").delete()
+        if fmt == "orm" or connection.vendor != "postgresql":
+            orm_segments(video_id, rows, batch_size)
+        else:
+            copy_segments(video_id, rows, batch_size, fmt)
+        # Ids come from the table's sequence in insertion order
+        return list(
+            TranscriptSegment.objects.filter(video_id=video_id).order_by("id").values_list("id", flat=True)
+        )
@@ -5,7 +5,7 @@ from .models import Video, TranscriptSegment
 class VideoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Video
-        fields = ["id", "title", "file", "duration_sec", "status", "created_at"]
+        fields = ["id", "title", "file", "duration_sec", "status", "language", "created_at"]
 
 
 class TranscriptSegmentSerializer(serializers.ModelSerializer):
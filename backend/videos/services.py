@@ -1,18 +1,51 @@
 from __future__ import annotations
 import os
+import time
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 from django.conf import settings
 from django.db import transaction
+from django.db.models import F
 
-from .models import TranscriptSegment, Video
+from .embedding_sets import active_embedding_set, active_fingerprint, segment_vectors, write_segment_embeddings
+from .live_search import load_matrix, rank, rescore
+from .models import EmbeddingSet, Video
+from .quantized import build_quantized_index, quantization_scheme, quantized_candidates
+from .segment_writer import replace_video_segments
+from .shards import open_shard, shards_enabled, write_shard
+from .utils.cache import get_search_cache, search_cache_key
+from .utils.checkpoints import CheckpointStore, chain_fingerprints
 from .utils.chunking import chunk_segments
-from .utils.embeddings import embed_text, embed_texts
-from .utils.ffmpeg import generate_frame
+from .utils.embeddings import embed_query, embed_texts, model_fingerprint
+from .utils.ffmpeg import extract_audio, generate_frame
+from .utils.metrics import JobTrace, counter, histogram
 from .utils.progress import send_progress
 from .utils.search import cosine
-from .utils.transcription import transcribe
+from .utils.transcription import batched_enabled, transcribe, transcription_options
+
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".webm")
+PIPELINE_STAGES = ("audio", "transcribe", "chunk", "embed", "index", "frames")
+_ARTIFACT_EXT = {"audio": "wav", "transcribe": "json", "chunk": "json", "embed": "npy", "index": "json", "frames": "json"}
+AUDIO_SAMPLE_RATE = 16000
+CHUNK_WINDOW_SEC = 15.0
+FRAME_OFFSET_SEC = 0.5
+
+PIPELINE_STAGE_SECONDS = histogram(
+    "scenequery_pipeline_stage_seconds", "Wall time of process_video stages", ["stage"]
+)
+PIPELINE_STAGE_SKIPPED = counter(
+    "scenequery_pipeline_stage_skipped_total", "Stages restored from a checkpoint instead of run", ["stage"]
+)
+PIPELINE_AUDIO_SECONDS = counter("scenequery_pipeline_audio_seconds_total", "Seconds of audio transcribed")
+PIPELINE_JOBS = counter("scenequery_pipeline_jobs_total", "Finished process_video runs", ["status"])
+SEARCH_PHASE_SECONDS = histogram(
+    "scenequery_search_phase_seconds", "Search latency by phase (embed, candidates, fetch, score, frame)", ["phase"]
+)
+SEARCH_SECONDS = histogram("scenequery_search_seconds", "End-to-end search latency", ["cache"])
+
 
 def _hhmmss(seconds: float) -> str:
     s = int(seconds)
@@ -22,42 +55,244 @@ def _hhmmss(seconds: float) -> str:
     return f"{h:02d}:{m:02d}:{sec:02d}"
 
 
-def process_video(video_id: int, file_path: Path) -> None:
+def _frame_name(video_id: int, start_sec: float) -> Tuple[str, float]:
+    # Frame at segment start + 0.5s
+    ts = float(start_sec) + FRAME_OFFSET_SEC
+    return f"{video_id}_{int(ts*1000)}.jpg", ts
+
+
+def ensure_frame(video: Video, start_sec: float) -> str:
+    """Render (once) the preview frame for a segment start; returns the frame file name."""
+    frame_name, ts = _frame_name(video.id, start_sec)
+    frames_dir = Path(settings.MEDIA_ROOT) / "frames"
+    frames_dir.mkdir(parents=True, exist_ok=True)
+    frame_path = frames_dir / frame_name
+    if not frame_path.exists():
+        generate_frame(Path(settings.MEDIA_ROOT) / video.file.name, frame_path, ts)
+    return frame_name
+
+
+def pipeline_checkpoints(video: Video, file_path: Path) -> CheckpointStore:
+    """
+    Checkpoint store for the video under the current configuration. Each stage's
+    fingerprint covers the source file and every setting that affects its output.
+    """
+    st = Path(file_path).stat()
+    configs = {
+        "audio": {"src": video.file.name, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sample_rate": AUDIO_SAMPLE_RATE},
+        "transcribe": {
+            "model": os.getenv("WHISPER_MODEL_PATH") or os.getenv("WHISPER_MODEL", "small"),
+            **transcription_options(),
+            # Batched decoding segments speech differently and always runs VAD; only keyed
+            # when on, so sequential checkpoints written before the option existed stay valid
+            **({"batched": True, "vad_filter": True} if batched_enabled() else {}),
+        },
+        "chunk": {"window_sec": CHUNK_WINDOW_SEC},
+        "embed": {"model": active_fingerprint()},
+        "index": {"quantization": quantization_scheme()},
+        "frames": {"offset_sec": FRAME_OFFSET_SEC},
+    }
+    return CheckpointStore(settings.PIPELINE_CHECKPOINT_DIR, video.id, chain_fingerprints(PIPELINE_STAGES, configs))
+
+
+def _set_id(embedding_set: Optional[EmbeddingSet]) -> Optional[int]:
+    return embedding_set.id if embedding_set is not None else None
+
+
+def _embed_chunks(chunks: List[Dict], embedding_set: Optional[EmbeddingSet]) -> List[List[float]]:
+    return embed_texts([c["text"] for c in chunks], model_name=embedding_set.model_name if embedding_set else None)
+
+
+def keep_audio() -> bool:
+    return os.getenv("PIPELINE_KEEP_AUDIO", "true").lower() != "false"
+
+
+def _audio_dropped(store: CheckpointStore) -> bool:
+    # With PIPELINE_KEEP_AUDIO=false the WAV is deleted after indexing; only transcribe reads it
+    return not store.has("audio", "wav") and store.has("transcribe", "json")
+
+
+def trace_path(video_id: int) -> Path:
+    return Path(settings.PIPELINE_CHECKPOINT_DIR) / str(video_id) / "trace.json"
+
+
+def _save_trace(trace: JobTrace) -> None:
+    try:
+        trace.save(trace_path(trace.job_id))
+    except Exception as e:
+        print(f"[videos] Could not write trace for video {trace.job_id}: {e}")
+
+
+def process_video(video_id: int, file_path: Path, from_stage: Optional[str] = None) -> None:
     """
     End-to-end processing pipeline for a video:
-      - Transcribe audio to segments
-      - Chunk segments into ~window blocks
-      - Embed chunk texts
-      - Store TranscriptSegment rows
-      - Update Video.status and emit websocket progress
+      - audio: extract mono 16 kHz WAV
+      - transcribe: audio to segments
+      - chunk: coalesce segments into ~window blocks
+      - embed: embed chunk texts
+      - index: store TranscriptSegment rows
+      - frames: pre-render preview frames for every chunk
+    Each stage writes a checkpoint artifact, and a retry resumes from the first
+    stage whose artifact is missing. from_stage forces a re-run from that stage on.
+    Updates Video.status and emits websocket progress. Stage timings feed the
+    /metrics histograms, and the job's trace is written next to its checkpoints.
     """
+    if from_stage is not None and from_stage not in PIPELINE_STAGES:
+        raise ValueError(f"unknown stage: {from_stage}")
+    trace = JobTrace("process_video", video_id, histogram=PIPELINE_STAGE_SECONDS)
     try:
-        send_progress(video_id, "transcribe", 10, "Transcribing...")
-        segments = transcribe(str(file_path), model_size=os.getenv("WHISPER_MODEL", "small"))
+        video = Video.objects.get(id=video_id)
+        if video.status != "processing":
+            video.status = "processing"
+            video.save(update_fields=["status"])
+        embedding_set = active_embedding_set()
+        store = pipeline_checkpoints(video, file_path)
+        if from_stage is not None:
+            store.invalidate(list(PIPELINE_STAGES[PIPELINE_STAGES.index(from_stage):]))
+        # Everything after the first missing artifact is recomputed, as its inputs may change
+        for i, stage in enumerate(PIPELINE_STAGES):
+            if not store.has(stage, _ARTIFACT_EXT[stage]) and not (stage == "audio" and _audio_dropped(store)):
+                store.invalidate(list(PIPELINE_STAGES[i + 1:]))
+                break
 
-        send_progress(video_id, "chunk", 30, "Chunking transcript...")
-        chunks = chunk_segments(segments, window_sec=15.0)
+        def cached(stage: str) -> bool:
+            if store.has(stage, _ARTIFACT_EXT[stage]) or (stage == "audio" and _audio_dropped(store)):
+                trace.skip(stage)
+                PIPELINE_STAGE_SKIPPED.labels(stage=stage).inc()
+                return True
+            return False
 
-        send_progress(video_id, "embed", 60, "Embedding text...")
-        vecs = embed_texts([c["text"] for c in chunks])
+        segments = chunks = vecs = None
 
-        video = Video.objects.get(id=video_id)
-        send_progress(video_id, "index", 80, "Saving index...")
-        with transaction.atomic():
-            TranscriptSegment.objects.filter(video=video).delete()
-            objs: List[TranscriptSegment] = []
-            for c, v in zip(chunks, vecs):
-                objs.append(TranscriptSegment(
-                    video=video,
-                    text=c["text"],
-                    start_sec=float(c["start"]),
-                    end_sec=float(c["end"]),
-                    embedding=v,
-                ))
-            TranscriptSegment.objects.bulk_create(objs)
+        if cached("audio"):
+            send_progress(video_id, "audio", 5, "Audio restored from checkpoint")
+        else:
+            send_progress(video_id, "audio", 5, "Extracting audio...")
+            with trace.span("audio"):
+                tmp = store.temp_path("audio", "wav")
+                extract_audio(file_path, tmp, sample_rate=AUDIO_SAMPLE_RATE)
+                store.commit_file("audio", "wav", tmp)
+
+        if cached("transcribe"):
+            send_progress(video_id, "transcribe", 10, "Transcript restored from checkpoint")
+        else:
+            send_progress(video_id, "transcribe", 10, "Transcribing...")
+            with trace.span("transcribe") as span:
+                segments, info = transcribe(
+                    str(store.path("audio", "wav")),
+                    model_size=os.getenv("WHISPER_MODEL", "small"),
+                    language=video.language or None,
+                )
+                store.save_json("transcribe", segments)
+                if info["language"] and info["language"] != video.language:
+                    video.language = info["language"]
+                    video.save(update_fields=["language"])
+                audio_sec = float(video.duration_sec or (segments[-1]["end"] if segments else 0.0))
+                span.update(audio_sec=audio_sec, segments=len(segments), **info)
+            if audio_sec:
+                span["rtf"] = round(span["duration_sec"] / audio_sec, 4)
+            PIPELINE_AUDIO_SECONDS.inc(audio_sec)
+
+        if cached("chunk"):
+            send_progress(video_id, "chunk", 30, "Chunks restored from checkpoint")
+        else:
+            send_progress(video_id, "chunk", 30, "Chunking transcript...")
+            with trace.span("chunk") as span:
+                if segments is None:
+                    segments = store.load_json("transcribe")
+                chunks = chunk_segments(segments, window_sec=CHUNK_WINDOW_SEC)
+                store.save_json("chunk", chunks)
+                span["chunks"] = len(chunks)
+
+        if cached("embed"):
+            send_progress(video_id, "embed", 60, "Embeddings restored from checkpoint")
+        else:
+            send_progress(video_id, "embed", 60, "Embedding text...")
+            with trace.span("embed") as span:
+                if chunks is None:
+                    chunks = store.load_json("chunk")
+                vecs = _embed_chunks(chunks, embedding_set)
+                store.save_array("embed", np.asarray(vecs, dtype=np.float32).reshape(len(vecs), -1) if vecs else np.zeros((0, 0), dtype=np.float32))
+                span["texts"] = len(vecs)
+
+        if cached("index"):
+            send_progress(video_id, "index", 80, "Index already saved")
+        else:
+            send_progress(video_id, "index", 80, "Saving index...")
+            with trace.span("index") as span:
+                if chunks is None:
+                    chunks = store.load_json("chunk")
+                if vecs is None:
+                    vecs = store.load_array("embed").tolist()
+                # A cutover may have replaced the set this job embedded for; its vectors
+                # would land in the inactive set and the new one would miss the video.
+                # Re-embedding runs outside the transaction, never while holding the lock.
+                while True:
+                    current = active_embedding_set(refresh=True)
+                    if _set_id(current) != _set_id(embedding_set):
+                        embedding_set, vecs = current, _embed_chunks(chunks, current)
+                        span["reembedded"] = True
+                    with transaction.atomic():
+                        # Lock the sets as activate_embedding_set does and re-check, so no
+                        # cutover commits between this check and the segment swap
+                        list(EmbeddingSet.objects.select_for_update().all())
+                        current = EmbeddingSet.objects.filter(is_active=True).first()
+                        if _set_id(current) == _set_id(embedding_set):
+                            segment_ids = replace_video_segments(
+                                video_id,
+                                ((c["text"], c["start"], c["end"], v) for c, v in zip(chunks, vecs)),
+                            )
+                            if embedding_set is not None:
+                                write_segment_embeddings(embedding_set.id, segment_ids, vecs)
+                            Video.objects.filter(id=video_id).update(index_version=F("index_version") + 1)
+                            break
+                    # Another cutover landed after the first check; release the lock and embed again
+                get_search_cache().invalidate_video(video_id)
+                video.refresh_from_db(fields=["index_version"])
+
+                fingerprint = embedding_set.fingerprint if embedding_set else model_fingerprint()
+                scheme = quantization_scheme()
+                if scheme and segment_ids:
+                    # Optional; search falls back to exact scoring if this is missing
+                    try:
+                        build_quantized_index(video_id, video.index_version, fingerprint, segment_ids, vecs, scheme)
+                    except Exception as e:
+                        print(f"[videos] Quantized index build failed for video {video_id}: {e}")
+                if shards_enabled():
+                    # Optional as well; without a current shard, search reads vectors from the database
+                    try:
+                        write_shard(
+                            video_id, video.index_version, fingerprint, segment_ids,
+                            [c["start"] for c in chunks], [c["end"] for c in chunks], [c["text"] for c in chunks], vecs,
+                        )
+                    except Exception as e:
+                        print(f"[videos] Vector shard write failed for video {video_id}: {e}")
+                store.save_json("index", {"index_version": video.index_version, "segments": len(segment_ids)})
+                span.update(segments=len(segment_ids), index_version=video.index_version)
+        if not keep_audio():
+            store.invalidate(["audio"])
+
+        if not cached("frames"):
+            send_progress(video_id, "frames", 90, "Rendering preview frames...")
+            with trace.span("frames") as span:
+                if chunks is None:
+                    chunks = store.load_json("chunk")
+                frames: List[str] = []
+                failed = 0
+                for c in chunks:
+                    try:
+                        frames.append(ensure_frame(video, c["start"]))
+                    except Exception:
+                        # Search renders missing frames on demand; not worth failing the video
+                        failed += 1
+                store.save_json("frames", {"frames": frames, "failed": failed})
+                span.update(frames=len(frames), failed=failed)
 
         video.status = "ready"
         video.save(update_fields=["status"])
+        PIPELINE_JOBS.labels(status="ready").inc()
+        trace.finish("ready")
+        _save_trace(trace)
         send_progress(video_id, "ready", 100, "Ready")
     except Exception as e:
         try:
@@ -66,43 +301,66 @@ def process_video(video_id: int, file_path: Path) -> None:
             video.save(update_fields=["status"])
         except Exception:
             pass
+        PIPELINE_JOBS.labels(status="error").inc()
+        trace.finish("error", error=str(e))
+        _save_trace(trace)
         send_progress(video_id, "error", 100, f"Error: {e}")
         # Re-raise so callers (e.g., upload view) can surface the error detail
         raise
 
 
-def search_video(video: Video, query: str) -> Dict:
+def search_video(video: Video, query: str, k: int = 3) -> Dict:
     """
     Compute best matching transcript segment for the query and generate a frame preview.
-    Returns a dict with keys: best, alternatives.
+    Returns a dict with keys: best, alternatives (up to k - 1 runners-up).
     """
-    qvec = embed_text(query)
-    segs = list(TranscriptSegment.objects.filter(video_id=video.id).values(
-        "id", "text", "start_sec", "end_sec", "embedding"
-    ))
-    if not segs:
-        raise ValueError("no segments")
-
-    scored: List[Tuple[float, Dict]] = []
-    for s in segs:
-        score = cosine(qvec, s["embedding"])  # safe even if normalized
-        scored.append((score, s))
-    scored.sort(key=lambda x: x[0], reverse=True)
+    embedding_set = active_embedding_set()
+    with SEARCH_PHASE_SECONDS.labels(phase="embed").time():
+        qvec = embed_query(query, model_name=embedding_set.model_name if embedding_set else None)
+    fingerprint = active_fingerprint()
+    # With a quantized index, only the first-pass candidates are fetched and rescored exactly
+    with SEARCH_PHASE_SECONDS.labels(phase="candidates").time():
+        candidate_ids = quantized_candidates(video, fingerprint, qvec, k)
+    if candidate_ids is None:
+        # Exact search over the cached segment matrix (mapped from the vector shard when one is current)
+        with SEARCH_PHASE_SECONDS.labels(phase="fetch").time():
+            matrix = load_matrix(video, fingerprint)
+        if not len(matrix):
+            raise ValueError("no segments")
+        with SEARCH_PHASE_SECONDS.labels(phase="score").time():
+            scored = [
+                (score, {"start_sec": float(matrix.start_sec[row]), "text": matrix.text(row)})
+                for row, score in rank(matrix, qvec, max(1, k))
+            ]
+    else:
+        # Rescore only the candidates: their rows are read from the mapped vector shard
+        # (pages stay in the OS page cache; nothing is pinned per video), else fetched
+        with SEARCH_PHASE_SECONDS.labels(phase="fetch").time():
+            shard = open_shard(video.id, video.index_version, fingerprint)
+            rows = shard.rows(candidate_ids) if shard is not None else None
+            segs = segment_vectors(video.id, segment_ids=candidate_ids) if rows is None else None
+        if not (len(rows) if rows is not None else segs):
+            raise ValueError("no segments")
+        with SEARCH_PHASE_SECONDS.labels(phase="score").time():
+            if rows is not None:
+                scored = [
+                    (score, {"start_sec": float(shard.start_sec[rows[i]]), "text": shard.text(int(rows[i]))})
+                    for i, score in rescore(shard.vectors[rows], qvec)[:max(1, k)]
+                ]
+            else:
+                scored = [(cosine(qvec, s["embedding"]), s) for s in segs]  # safe even if normalized
+                scored.sort(key=lambda x: x[0], reverse=True)
 
     best_score, best = scored[0]
-    alt = scored[1:3]
+    alt = scored[1:max(1, k)]
 
-    # Frame at best start + 0.5s
-    ts = float(best["start_sec"]) + 0.5
-    frames_dir = Path(settings.MEDIA_ROOT) / "frames"
-    frames_dir.mkdir(parents=True, exist_ok=True)
-    frame_name = f"{video.id}_{int(ts*1000)}.jpg"
-    frame_path = frames_dir / frame_name
-    try:
-        if not frame_path.exists():
-            generate_frame(Path(settings.MEDIA_ROOT) / video.file.name, frame_path, ts)
-    except Exception:
-        pass
+    # Usually pre-rendered by the pipeline's frames stage
+    frame_name, _ = _frame_name(video.id, best["start_sec"])
+    with SEARCH_PHASE_SECONDS.labels(phase="frame").time():
+        try:
+            ensure_frame(video, best["start_sec"])
+        except Exception:
+            pass
 
     return {
         "best": {
@@ -122,3 +380,25 @@ def search_video(video: Video, query: str) -> Dict:
             for sc, s in alt
         ],
     }
+
+
+def search_etag_key(video: Video, query: str, k: int = 3) -> str:
+    return search_cache_key(video.id, video.index_version, active_fingerprint(), query, k, quantization_scheme())
+
+
+def cached_search_video(video: Video, query: str, k: int = 3) -> Tuple[Dict, str, bool]:
+    """
+    search_video() behind the configured result cache.
+    Returns (data, cache_key, hit); the key doubles as the response ETag.
+    """
+    t0 = time.perf_counter()
+    key = search_etag_key(video, query, k)
+    cache = get_search_cache()
+    data = cache.get(key)
+    if data is not None:
+        SEARCH_SECONDS.labels(cache="hit").observe(time.perf_counter() - t0)
+        return data, key, True
+    data = search_video(video, query, k)
+    cache.set(key, video.id, data)
+    SEARCH_SECONDS.labels(cache="miss").observe(time.perf_counter() - t0)
+    return data, key, False
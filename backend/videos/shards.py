@@ -0,0 +1,224 @@
+from __future__ import annotations
+import os
+import struct
+import tempfile
+import threading
+import zlib
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+
+from .utils.metrics import counter
+
+# Shard layout (little-endian). A 128-byte header, then sections aligned to 64 bytes:
+#   vectors      float32[count, dim]  L2-normalized
+#   segment_ids  int64[count]
+#   start_sec    float64[count]
+#   end_sec      float64[count]
+#   text_offsets uint64[count + 1]    into the text blob
+#   text         utf-8 bytes
+# The checksum is a CRC-32 of everything after the header.
+MAGIC = b"SQVS"
+VERSION = 1
+HEADER_SIZE = 128
+_HEADER = struct.Struct("<4sHHIQQ32sQI")
+_ALIGN = 64
+_CRC_BLOCK = 16 * 1024 * 1024
+
+SHARD_LOADS = counter("scenequery_vector_shard_loads_total", "Vector shard opens by result", ["result"])
+
+# Shards whose checksum this process has verified, by (path, inode, mtime)
+_verified: set = set()
+_verified_lock = threading.Lock()
+
+
+def shards_enabled() -> bool:
+    return os.getenv("VECTOR_SHARDS", "true").lower() != "false"
+
+
+def shard_dir() -> Path:
+    return Path(settings.VECTOR_SHARD_DIR)
+
+
+def shard_path(video_id: int) -> Path:
+    return shard_dir() / f"{video_id}.vshard"
+
+
+def _aligned(n: int) -> int:
+    return -(-n // _ALIGN) * _ALIGN
+
+
+def _layout(count: int, dim: int) -> dict:
+    offsets = {}
+    pos = HEADER_SIZE
+    for name, nbytes in (
+        ("vectors", count * dim * 4),
+        ("segment_ids", count * 8),
+        ("start_sec", count * 8),
+        ("end_sec", count * 8),
+        ("text_offsets", (count + 1) * 8),
+    ):
+        offsets[name] = pos
+        pos = _aligned(pos + nbytes)
+    offsets["text"] = pos
+    return offsets
+
+
+class VectorShard:
+    """
+    Read-only view of a shard file. Every array is backed by one shared mmap, so
+    pages come from the OS page cache and are shared by all processes using it.
+    """
+
+    def __init__(self, path: Path, mm: np.memmap, dim: int, count: int, index_version: int, fingerprint: str):
+        self.path = path
+        self.dim = dim
+        self.count = count
+        self.index_version = index_version
+        self.fingerprint = fingerprint
+        off = _layout(count, dim)
+
+        def view(name: str, dtype, n: int) -> np.ndarray:
+            return np.frombuffer(mm, dtype=dtype, count=n, offset=off[name])
+
+        self.vectors = view("vectors", np.float32, count * dim).reshape(count, dim)
+        self.segment_ids = view("segment_ids", np.int64, count)
+        self.start_sec = view("start_sec", np.float64, count)
+        self.end_sec = view("end_sec", np.float64, count)
+        self._text_offsets = view("text_offsets", np.uint64, count + 1)
+        self._text = mm[off["text"]:]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def rows(self, segment_ids: Sequence[int]) -> Optional[np.ndarray]:
+        """Row numbers of segment_ids (in their order), or None if any is not in the shard."""
+        ids = np.asarray(segment_ids, dtype=np.int64)
+        if not self.count:
+            return None if len(ids) else ids
+        # Rows are written in segment order, which is insertion (and so id) order
+        rows = np.minimum(np.searchsorted(self.segment_ids, ids), self.count - 1)
+        return rows if np.array_equal(self.segment_ids[rows], ids) else None
+
+    def text(self, row: int) -> str:
+        a, b = int(self._text_offsets[row]), int(self._text_offsets[row + 1])
+        return bytes(self._text[a:b]).decode("utf-8")
+
+
+def write_shard(
+    video_id: int,
+    index_version: int,
+    fingerprint: str,
+    segment_ids: Sequence[int],
+    start_sec: Sequence[float],
+    end_sec: Sequence[float],
+    texts: Sequence[str],
+    vectors: Sequence[Sequence[float]],
+) -> Path:
+    """
+    Write the video's shard to a temp file in the shard directory, fsync it and
+    os.replace() it over the old one. Processes that mapped the old file keep
+    reading it until they reopen; nobody ever sees a partial shard.
+    """
+    count = len(segment_ids)
+    vecs = np.asarray(vectors, dtype=np.float32).reshape(count, -1) if count else np.zeros((0, 0), dtype=np.float32)
+    dim = vecs.shape[1]
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vecs = vecs / norms
+    encoded = [t.encode("utf-8") for t in texts]
+    text_offsets = np.zeros(count + 1, dtype=np.uint64)
+    text_offsets[1:] = np.cumsum([len(b) for b in encoded], dtype=np.uint64)
+    off = _layout(count, dim)
+
+    sections = [
+        (off["vectors"], np.ascontiguousarray(vecs).tobytes()),
+        (off["segment_ids"], np.asarray(segment_ids, dtype=np.int64).tobytes()),
+        (off["start_sec"], np.asarray(start_sec, dtype=np.float64).tobytes()),
+        (off["end_sec"], np.asarray(end_sec, dtype=np.float64).tobytes()),
+        (off["text_offsets"], text_offsets.tobytes()),
+        (off["text"], b"".join(encoded)),
+    ]
+    dest = shard_path(video_id)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{video_id}.", suffix=".tmp", dir=dest.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"\0" * HEADER_SIZE)
+            crc = 0
+            pos = HEADER_SIZE
+            for start, data in sections:
+                pad = b"\0" * (start - pos)
+                f.write(pad)
+                f.write(data)
+                crc = zlib.crc32(data, zlib.crc32(pad, crc))
+                pos = start + len(data)
+            header = _HEADER.pack(
+                MAGIC, VERSION, 0, dim, count, index_version,
+                fingerprint.encode("ascii")[:32], len(sections[-1][1]), crc,
+            )
+            f.seek(0)
+            f.write(header.ljust(HEADER_SIZE, b"\0"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, dest)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return dest
+
+
+def open_shard(video_id: int, index_version: int, fingerprint: str) -> Optional[VectorShard]:
+    """
+    Map the video's shard if it exists and was built from this index_version and
+    embedding fingerprint. The checksum is verified the first time each file is
+    opened in a process. Returns None (caller reads the database) when disabled,
+    missing, stale or corrupt.
+    """
+    if not shards_enabled():
+        return None
+    path = shard_path(video_id)
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        SHARD_LOADS.labels(result="missing").inc()
+        return None
+    try:
+        if st.st_size < HEADER_SIZE:
+            raise ValueError("truncated header")
+        mm = np.memmap(path, dtype=np.uint8, mode="r")
+        magic, version, _, dim, count, shard_version, fp, text_bytes, crc = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a vector shard")
+        if shard_version != index_version or fp.rstrip(b"\0").decode("ascii") != fingerprint:
+            SHARD_LOADS.labels(result="stale").inc()
+            return None
+        if st.st_size != _layout(count, dim)["text"] + text_bytes:
+            raise ValueError("size does not match header")
+        key = (str(path), st.st_ino, st.st_mtime_ns)
+        if key not in _verified:
+            actual = 0
+            for i in range(HEADER_SIZE, st.st_size, _CRC_BLOCK):
+                actual = zlib.crc32(mm[i:i + _CRC_BLOCK], actual)
+            if actual != crc:
+                raise ValueError("checksum mismatch")
+            with _verified_lock:
+                _verified.add(key)
+    except (ValueError, OSError, struct.error) as e:
+        SHARD_LOADS.labels(result="corrupt").inc()
+        print(f"[videos] Ignoring vector shard {path}: {e}")
+        return None
+    SHARD_LOADS.labels(result="hit").inc()
+    return VectorShard(path, mm, dim, count, index_version, fingerprint)
+
+
+def remove_shard(video_id: int) -> None:
+    try:
+        shard_path(video_id).unlink()
+    except FileNotFoundError:
+        pass
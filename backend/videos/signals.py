@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Video
+from .shards import remove_shard
+from .utils.checkpoints import CheckpointStore
+
+
+@receiver(post_delete, sender=Video)
+def remove_video_artifacts(sender, instance: Video, **kwargs) -> None:
+    """Drop the video's checkpoints and vector shard once its deletion commits."""
+    video_id = instance.id
+
+    def remove() -> None:
+        CheckpointStore(settings.PIPELINE_CHECKPOINT_DIR, video_id, {}).clear()
+        remove_shard(video_id)
+
+    transaction.on_commit(remove)
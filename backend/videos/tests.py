@@ -0,0 +1,356 @@
+from __future__ import annotations
+import base64
+import json
+import os
+import tempfile
+from concurrent.futures import Future
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from benchmarks.stubs import StubEmbedder, StubWhisper, stub_backends
+
+from . import live_search, quantized, services
+from .consumers import VideoSearchConsumer
+from .management.commands import ingest
+from .embedding_sets import activate_embedding_set, active_embedding_set
+from .models import EmbeddingSet, SegmentEmbedding, TranscriptSegment, Video
+from .shards import shard_path
+from .transcripts import decode_cursor, encode_cursor
+from .utils import embeddings
+from .utils.cache import LRUCache, search_cache_key
+from .utils.embeddings import model_fingerprint
+from .utils.scheduler import CoreBudget
+
+
+class PipelineTestCase(TestCase):
+    """Runs process_video on stub models and ffmpeg, with media and checkpoints in a temp dir."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        settings = override_settings(
+            MEDIA_ROOT=self.tmp.name,
+            PIPELINE_CHECKPOINT_DIR=str(Path(self.tmp.name) / "checkpoints"),
+            VECTOR_SHARD_DIR=str(Path(self.tmp.name) / "shards"),
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        stubs = stub_backends(dim=32, whisper=StubWhisper(40))
+        stubs.__enter__()
+        self.addCleanup(stubs.__exit__, None, None, None)
+        named = mock.patch.dict(embeddings._named_model_cache, {"stub-old": StubEmbedder(32, 0), "stub-new": StubEmbedder(32, 0)})
+        named.start()
+        self.addCleanup(named.stop)
+        # Per-process caches are keyed by video id, which the test database reuses
+        live_search._matrix_cache.clear()
+        quantized._codes_cache.clear()
+        active_embedding_set(refresh=True)
+
+    def _upload(self, title: str) -> Video:
+        # Saved under the temp MEDIA_ROOT; the stub ffmpeg never reads it
+        return Video.objects.create(title=title, file=ContentFile(b"\0" * 1024, name=f"{title}.mp4"), status="ready")
+
+    def _process(self, title: str) -> Video:
+        video = self._upload(title)
+        services.process_video(video.id, Path(self.tmp.name) / video.file.name)
+        video.refresh_from_db()
+        return video
+
+
+class EmbeddingCutoverTests(PipelineTestCase):
+    def setUp(self):
+        super().setUp()
+        self.old_set = EmbeddingSet.objects.create(
+            model_name="stub-old", fingerprint=model_fingerprint("stub-old"), dim=32, status="ready"
+        )
+        activate_embedding_set(self.old_set)
+
+    def test_cutover_between_embed_and_index_writes_the_new_set(self):
+        video = self._upload("cutover")
+        new_set = EmbeddingSet.objects.create(model_name="stub-new", fingerprint=model_fingerprint("stub-new"), dim=32)
+        send_progress = services.send_progress
+
+        def cutover_before_index(video_id, stage, *args, **kwargs):
+            if stage == "index":
+                activate_embedding_set(new_set)
+            return send_progress(video_id, stage, *args, **kwargs)
+
+        with mock.patch.object(services, "send_progress", side_effect=cutover_before_index):
+            services.process_video(video.id, Path(self.tmp.name) / video.file.name)
+
+        self.assertEqual(active_embedding_set(refresh=True).id, new_set.id)
+        segments = TranscriptSegment.objects.filter(video=video).count()
+        self.assertGreater(segments, 0)
+        self.assertEqual(SegmentEmbedding.objects.filter(embedding_set=new_set, segment__video=video).count(), segments)
+        video.refresh_from_db()
+        result = services.search_video(video, "anything", k=3)
+        self.assertIn("best", result)
+
+
+    def test_reembedding_never_runs_under_the_embedding_set_lock(self):
+        video = self._upload("cutover-twice")
+        first = EmbeddingSet.objects.create(model_name="stub-new", fingerprint=model_fingerprint("stub-new"), dim=32)
+        second = EmbeddingSet.objects.create(model_name="stub-old", fingerprint="second-stub-old", dim=32)
+        send_progress, embed_chunks = services.send_progress, services._embed_chunks
+        depth = len(connection.savepoint_ids)
+        depths = []
+
+        def cutover_before_index(video_id, stage, *args, **kwargs):
+            if stage == "index":
+                activate_embedding_set(first)
+            return send_progress(video_id, stage, *args, **kwargs)
+
+        def slow_embed(chunks, embedding_set):
+            depths.append(len(connection.savepoint_ids))
+            if embedding_set is not None and embedding_set.id == first.id:
+                # Another cutover lands while this job is re-embedding
+                activate_embedding_set(second)
+            return embed_chunks(chunks, embedding_set)
+
+        with mock.patch.object(services, "send_progress", side_effect=cutover_before_index), \
+                mock.patch.object(services, "_embed_chunks", side_effect=slow_embed):
+            services.process_video(video.id, Path(self.tmp.name) / video.file.name)
+
+        self.assertEqual(depths, [depth] * 3)
+        segments = TranscriptSegment.objects.filter(video=video).count()
+        self.assertEqual(SegmentEmbedding.objects.filter(embedding_set=second, segment__video=video).count(), segments)
+
+
+class ExactSearchTests(PipelineTestCase):
+    @override_settings(ALLOWED_HOSTS=["*"])
+    def test_ready_video_without_segments_is_a_client_error(self):
+        video = self._upload("empty")
+        with mock.patch.dict(os.environ, {"VECTOR_SHARDS": "false"}):
+            with self.assertRaisesMessage(ValueError, "no segments"):
+                services.search_video(video, "anything", k=3)
+            resp = self.client.get(f"/api/videos/{video.id}/search", {"q": "anything"})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.json()["detail"], "no segments")
+
+
+class QuantizedSearchTests(PipelineTestCase):
+    def _search(self, video, **env):
+        with mock.patch.dict(os.environ, {"SEARCH_QUANTIZATION": "int8", **env}), \
+                mock.patch.object(services, "load_matrix", side_effect=AssertionError("whole matrix loaded")):
+            return services.search_video(video, "lo tekaze", k=3)
+
+    def test_candidates_are_rescored_from_the_shard(self):
+        with mock.patch.dict(os.environ, {"SEARCH_QUANTIZATION": "int8"}):
+            video = self._process("int8")
+        with mock.patch.object(services, "segment_vectors", side_effect=AssertionError("database fetch")):
+            approx = self._search(video)
+        self.assertEqual(live_search._matrix_cache, {})
+        # Every segment is a rescoring candidate here, so the ranking matches exact search
+        self.assertEqual(approx, services.search_video(video, "lo tekaze", k=3))
+
+    def test_candidates_are_fetched_without_a_shard(self):
+        with mock.patch.dict(os.environ, {"SEARCH_QUANTIZATION": "int8", "VECTOR_SHARDS": "false"}):
+            video = self._process("int8-db")
+        approx = self._search(video, VECTOR_SHARDS="false")
+        self.assertEqual(live_search._matrix_cache, {})
+        self.assertEqual(approx, services.search_video(video, "lo tekaze", k=3))
+
+
+class LiveSearchConnectTests(PipelineTestCase):
+    def _connect(self, video: Video) -> list:
+        async def run():
+            app = VideoSearchConsumer.as_asgi()
+            comm = WebsocketCommunicator(app, f"/ws/videos/{video.id}/search/")
+            comm.scope["url_route"] = {"kwargs": {"video_id": str(video.id)}}
+            connected, _ = await comm.connect()
+            self.assertTrue(connected)
+            messages = [await comm.receive_json_from()]
+            await comm.send_json_to({"type": "query", "text": "anything", "seq": 1})
+            messages.append(await comm.receive_json_from())
+            await comm.disconnect()
+            return messages
+
+        # database_sync_to_async would close the test transaction's connection
+        with mock.patch("channels.db.close_old_connections"):
+            return async_to_sync(run)()
+
+    def test_video_without_segments_connects_and_returns_nothing(self):
+        info, results = self._connect(self._upload("empty"))
+        self.assertEqual((info["type"], info["segments"]), ("search_info", 0))
+        self.assertEqual((results["type"], results["results"]), ("search_results", []))
+
+    def test_load_failure_is_reported_not_raised(self):
+        video = self._process("clip")
+        with mock.patch("videos.consumers.load_matrix", side_effect=RuntimeError("still processing")):
+            info, results = self._connect(video)
+        self.assertEqual(info["type"], "search_error")
+        self.assertIn("not ready", info["error"])
+        self.assertEqual(results["type"], "search_error")
+
+
+class CheckpointCleanupTests(PipelineTestCase):
+    def test_deleting_a_video_removes_its_checkpoints_and_shard(self):
+        video = self._process("delete-me")
+        store_dir = Path(self.tmp.name) / "checkpoints" / str(video.id)
+        shard = shard_path(video.id)
+        self.assertTrue(store_dir.is_dir())
+        self.assertTrue(shard.exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            video.delete()
+        self.assertFalse(store_dir.exists())
+        self.assertFalse(shard.exists())
+
+    def test_audio_can_be_dropped_after_indexing(self):
+        with mock.patch.dict(os.environ, {"PIPELINE_KEEP_AUDIO": "false"}):
+            video = self._process("no-audio")
+            store = services.pipeline_checkpoints(video, Path(self.tmp.name) / video.file.name)
+            self.assertFalse(store.has("audio", "wav"))
+            with mock.patch.object(services, "extract_audio", side_effect=AssertionError("audio re-extracted")):
+                services.process_video(video.id, Path(self.tmp.name) / video.file.name, from_stage="embed")
+        self.assertTrue(store.has("transcribe", "json"))
+
+
+class TranscriptCursorTests(TestCase):
+    def test_non_finite_cursor_is_rejected(self):
+        self.assertEqual(decode_cursor(encode_cursor(12.5, 7)), (12.5, 7))
+        for value in ("nan", "inf", "-Infinity"):
+            raw = base64.urlsafe_b64encode(json.dumps([value, 1]).encode()).decode().rstrip("=")
+            with self.assertRaisesMessage(ValueError, "invalid cursor"):
+                decode_cursor(raw)
+
+
+class SearchCacheTests(TestCase):
+    def test_key_covers_the_quantization_scheme(self):
+        keys = {search_cache_key(1, 2, "fp", "query", 3, scheme) for scheme in (None, "int8", "binary")}
+        self.assertEqual(len(keys), 3)
+        self.assertEqual(search_cache_key(1, 2, "fp", "query", 3), search_cache_key(1, 2, "fp", " query ", 3, None))
+
+    def test_memory_cache_hands_out_copies(self):
+        cache = LRUCache(4)
+        payload = {"best": {"text": "a"}, "alternatives": []}
+        cache.set("k", 1, payload)
+        payload["best"]["text"] = "changed by the caller"
+        cache.get("k")["alternatives"].append({"text": "b"})
+        self.assertEqual(cache.get("k"), {"best": {"text": "a"}, "alternatives": []})
+
+
+class _DeferredExecutor:
+    """
+    ProcessPoolExecutor stand-in that runs jobs in this process, one per wait()
+    call (see _wait_one), so submission order and timing match a busy real pool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        fut = Future()
+        fut.job = (fn, args)
+        return fut
+
+    def shutdown(self, **kwargs):
+        pass
+
+
+def _wait_one(fs, return_when=None):
+    fut = next(f for f in fs if not f.done())
+    fn, args = fut.job
+    try:
+        fut.set_result(fn(*args))
+    except Exception as e:
+        fut.set_exception(e)
+    return {fut}, {f for f in fs if f is not fut}
+
+
+class IngestCommandTests(PipelineTestCase):
+    def setUp(self):
+        super().setUp()
+        self.src = Path(self.tmp.name) / "catalog"
+        self.src.mkdir()
+        for name in ("a", "b", "c"):
+            (self.src / f"{name}.mp4").write_bytes(name.encode() * 64)
+        for patcher in (
+            mock.patch.object(ingest, "ProcessPoolExecutor", _DeferredExecutor),
+            mock.patch.object(ingest, "wait", _wait_one),
+            mock.patch("videos.utils.ffmpeg.get_duration_seconds", return_value=60.0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _ingest(self) -> str:
+        out = StringIO()
+        call_command("ingest", str(self.src), "--workers", "1", stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_rerun_skips_ingested_files_and_requeues_deleted_videos(self):
+        self.assertIn("3 to ingest, 0 skipped", self._ingest())
+        self.assertEqual(Video.objects.filter(status="ready").count(), 3)
+        self.assertIn("0 to ingest, 3 skipped", self._ingest())
+
+        # A "done" record whose video was deleted, written without a duration
+        fp = ingest.file_fingerprint(self.src / "a.mp4")
+        gone = ingest.load_ledger(self.src / ingest.LEDGER_NAME)[fp]["video_id"]
+        Video.objects.filter(id=gone).delete()
+        with open(self.src / ingest.LEDGER_NAME, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"fingerprint": fp, "status": "done", "video_id": gone}) + "\n")
+
+        self.assertIn("1 to ingest, 2 skipped", self._ingest())
+        self.assertEqual(Video.objects.filter(status="ready").count(), 3)
+        self.assertEqual(ingest.load_ledger(self.src / ingest.LEDGER_NAME)[fp]["status"], "done")
+
+    def test_videos_are_created_as_jobs_are_submitted(self):
+        counts = []
+        process_one = ingest._process_one
+
+        def counting(video_id, src):
+            counts.append(Video.objects.count())
+            return process_one(video_id, src)
+
+        with mock.patch.object(ingest, "_process_one", side_effect=counting):
+            self._ingest()
+        self.assertEqual(counts, [1, 2, 3])
+
+
+class IngestAdmissionTests(TestCase):
+    """With the one ingest slot busy and no queue, new jobs get 429 and Retry-After."""
+
+    def setUp(self):
+        self.budget = CoreBudget(total=2, interactive=0, max_jobs=1, queue_limit=0)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings = override_settings(MEDIA_ROOT=tmp.name, ALLOWED_HOSTS=["*"])
+        settings.enable()
+        self.addCleanup(settings.disable)
+        patcher = mock.patch("videos.views.get_core_budget", return_value=self.budget)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertQueueFull(self, resp):
+        self.assertEqual(resp.status_code, 429)
+        self.assertGreaterEqual(int(resp["Retry-After"]), 1)
+        self.assertEqual(self.budget.rejected, 1)
+
+    def test_upload_is_refused_before_anything_is_saved(self):
+        with self.budget.ingest_slot():
+            resp = self.client.post("/api/videos/", {"file": SimpleUploadedFile("clip.mp4", b"\0" * 16)})
+        self.assertQueueFull(resp)
+        self.assertFalse(Video.objects.exists())
+
+    def test_reprocess_is_refused(self):
+        video = Video.objects.create(title="clip", file=ContentFile(b"\0" * 16, name="clip.mp4"), status="error")
+        with self.budget.ingest_slot():
+            resp = self.client.post(f"/api/videos/{video.id}/reprocess", {}, content_type="application/json")
+        self.assertQueueFull(resp)
+        video.refresh_from_db()
+        self.assertEqual(video.status, "error")
@@ -0,0 +1,137 @@
+from __future__ import annotations
+import base64
+import json
+import math
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from django.db.models import OuterRef, Q, Subquery
+
+from .embedding_sets import active_embedding_set
+from .models import SegmentEmbedding, TranscriptSegment
+
+TRANSCRIPT_FIELDS = ("id", "start_sec", "end_sec", "text", "embedding")
+# Embeddings are ~384 floats per row; only sent when asked for
+DEFAULT_FIELDS = ("id", "start_sec", "end_sec", "text")
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson; charset=utf-8",
+    "vtt": "text/vtt; charset=utf-8",
+    "srt": "application/x-subrip; charset=utf-8",
+}
+# Rows fetched per server-side cursor round trip and rendered per streamed chunk
+EXPORT_BATCH_ROWS = 2000
+
+
+def parse_fields(value: Optional[str]) -> Tuple[str, ...]:
+    """Comma-separated field names, in TRANSCRIPT_FIELDS order. Raises ValueError on unknown names."""
+    if not value:
+        return DEFAULT_FIELDS
+    names = {f.strip() for f in value.split(",") if f.strip()}
+    unknown = names.difference(TRANSCRIPT_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}; allowed: {', '.join(TRANSCRIPT_FIELDS)}")
+    return tuple(f for f in TRANSCRIPT_FIELDS if f in names)
+
+
+def encode_cursor(start_sec: float, segment_id: int) -> str:
+    raw = json.dumps([start_sec, segment_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        start_sec, segment_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        start_sec, segment_id = float(start_sec), int(segment_id)
+    except Exception:
+        raise ValueError("invalid cursor")
+    if not math.isfinite(start_sec):
+        raise ValueError("invalid cursor")
+    return start_sec, segment_id
+
+
+def _segments(video_id: int, fields: Sequence[str], after: Optional[Tuple[float, int]] = None):
+    """
+    values() rows of the video's segments in (start_sec, id) order, served by the
+    (video, start_sec) index. "embedding" comes from the active embedding set if any.
+    """
+    qs = TranscriptSegment.objects.filter(video_id=video_id)
+    if after is not None:
+        start_sec, segment_id = after
+        qs = qs.filter(Q(start_sec__gt=start_sec) | Q(start_sec=start_sec, id__gt=segment_id))
+    columns = [f for f in fields if f != "embedding"]
+    for key in ("id", "start_sec"):
+        if key not in columns:
+            columns.append(key)
+    if "embedding" in fields:
+        es = active_embedding_set()
+        if es is not None:
+            vector = SegmentEmbedding.objects.filter(embedding_set=es, segment_id=OuterRef("pk")).values("vector")[:1]
+            qs = qs.annotate(active_vector=Subquery(vector))
+            columns.append("active_vector")
+        else:
+            columns.append("embedding")
+    return qs.order_by("start_sec", "id").values(*columns)
+
+
+def _row(r: Dict, fields: Sequence[str]) -> Dict:
+    out = {}
+    for f in fields:
+        out[f] = r["active_vector"] if f == "embedding" and "active_vector" in r else r[f]
+    return out
+
+
+def transcript_page(
+    video_id: int,
+    fields: Sequence[str] = DEFAULT_FIELDS,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict], Optional[str]]:
+    """One keyset page of segments after cursor; returns (rows, next_cursor or None at the end)."""
+    after = decode_cursor(cursor) if cursor else None
+    rows = list(_segments(video_id, fields, after)[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]["start_sec"], rows[-1]["id"]) if more else None
+    return [_row(r, fields) for r in rows], next_cursor
+
+
+def _timestamp(seconds: float, sep: str) -> str:
+    ms = max(0, int(round(seconds * 1000)))
+    h, ms = divmod(ms, 3_600_000)
+    m, ms = divmod(ms, 60_000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}{sep}{ms:03d}"
+
+
+def _cue_text(text: str) -> str:
+    # A blank line would end the cue early
+    return "\n".join(line for line in text.strip().splitlines() if line.strip())
+
+
+def iter_export(video_id: int, fmt: str, fields: Sequence[str] = DEFAULT_FIELDS) -> Iterator[str]:
+    """
+    Render the whole transcript as NDJSON (the selected fields), WebVTT or SRT.
+    Rows come from a server-side cursor (.iterator()) and are yielded as one string
+    per EXPORT_BATCH_ROWS rows, so memory stays flat however long the video is.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if fmt != "ndjson":
+        fields = ("id", "start_sec", "end_sec", "text")
+    rows = _segments(video_id, fields).iterator(chunk_size=EXPORT_BATCH_ROWS)
+
+    if fmt == "vtt":
+        yield "WEBVTT\n\n"
+    parts: List[str] = []
+    for n, r in enumerate(rows, start=1):
+        if fmt == "ndjson":
+            parts.append(json.dumps(_row(r, fields), ensure_ascii=False, separators=(",", ":")) + "\n")
+        elif fmt == "vtt":
+            text = _cue_text(r["text"]).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+            parts.append(f"{_timestamp(r['start_sec'], '.')} --> {_timestamp(r['end_sec'], '.')}\n{text}\n\n")
+        else:
+            parts.append(f"{n}\n{_timestamp(r['start_sec'], ',')} --> {_timestamp(r['end_sec'], ',')}\n{_cue_text(r['text'])}\n\n")
+        if len(parts) >= EXPORT_BATCH_ROWS:
+            yield "".join(parts)
+            parts = []
+    if parts:
+        yield "".join(parts)
@@ -4,6 +4,16 @@ from . import views
 urlpatterns = [
     path("api/videos/", views.VideoUploadView.as_view(), name="video-upload"),
     path("api/videos/<int:video_id>/", views.VideoDetailView.as_view(), name="video-detail"),
+    path("api/videos/<int:video_id>/reprocess", views.VideoReprocessView.as_view(), name="video-reprocess"),
     path("api/videos/<int:video_id>/search", views.VideoSearchView.as_view(), name="video-search"),
+    path("api/videos/<int:video_id>/transcript", views.VideoTranscriptView.as_view(), name="video-transcript"),
+    path(
+        "api/videos/<int:video_id>/transcript.<str:fmt>",
+        views.VideoTranscriptExportView.as_view(),
+        name="video-transcript-export",
+    ),
+    path("api/videos/<int:video_id>/trace", views.VideoTraceView.as_view(), name="video-trace"),
+    path("api/search/cache/stats", views.SearchCacheStatsView.as_view(), name="search-cache-stats"),
     path("api/chat", views.ChatView.as_view(), name="chat"),
+    path("metrics", views.MetricsView.as_view(), name="metrics"),
 ]
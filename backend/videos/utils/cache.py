@@ -0,0 +1,233 @@
+from __future__ import annotations
+import copy
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from .metrics import REGISTRY
+
+_cache_backend = None
+_cache_lock = threading.Lock()
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split())
+
+
+def search_cache_key(
+    video_id: int,
+    index_version: int,
+    model_fingerprint: str,
+    query: str,
+    k: int,
+    quantization: Optional[str] = None,
+) -> str:
+    """
+    Deterministic cache key for a search request. Any change to the video's index
+    (index_version), to the embedding model (fingerprint) or to the quantization
+    scheme (which can rank differently) yields a new key.
+    """
+    raw = "\x1f".join([
+        str(video_id),
+        str(index_version),
+        model_fingerprint,
+        quantization or "none",
+        str(k),
+        normalize_query(query),
+    ])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def as_dict(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class NullCache:
+    name = "none"
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> Optional[Dict]:
+        self.stats.misses += 1
+        return None
+
+    def set(self, key: str, video_id: int, payload: Dict) -> None:
+        pass
+
+    def invalidate_video(self, video_id: int) -> None:
+        pass
+
+    def size(self) -> int:
+        return 0
+
+
+class LRUCache:
+    """In-process LRU cache. Cheap, but not shared between worker processes."""
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max(1, max_entries)
+        self.stats = CacheStats()
+        self._data: "OrderedDict[str, tuple[int, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.stats.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.stats.hits += 1
+        # Copies in and out, so callers never share (and mutate) the cached entry
+        return copy.deepcopy(item[1])
+
+    def set(self, key: str, video_id: int, payload: Dict) -> None:
+        payload = copy.deepcopy(payload)
+        with self._lock:
+            self._data[key] = (video_id, payload)
+            self._data.move_to_end(key)
+            self.stats.sets += 1
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+    def invalidate_video(self, video_id: int) -> None:
+        with self._lock:
+            stale = [k for k, (vid, _) in self._data.items() if vid == video_id]
+            for k in stale:
+                del self._data[k]
+            self.stats.evictions += len(stale)
+
+    def size(self) -> int:
+        return len(self._data)
+
+
+class DatabaseCache:
+    """
+    Cache stored in the SearchCacheEntry table so it is shared by every worker and
+    survives restarts. Bounded by max_entries (oldest entries are pruned first).
+    """
+    name = "postgres"
+    prune_every = 100
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max(1, max_entries)
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        from ..models import SearchCacheEntry
+
+        try:
+            payload = SearchCacheEntry.objects.filter(key=key).values_list("payload", flat=True).first()
+        except Exception:
+            self.stats.errors += 1
+            payload = None
+        with self._lock:
+            if payload is None:
+                self.stats.misses += 1
+            else:
+                self.stats.hits += 1
+        return payload
+
+    def set(self, key: str, video_id: int, payload: Dict) -> None:
+        from ..models import SearchCacheEntry
+
+        try:
+            SearchCacheEntry.objects.update_or_create(key=key, defaults={"video_id": video_id, "payload": payload})
+        except Exception:
+            self.stats.errors += 1
+            return
+        with self._lock:
+            self.stats.sets += 1
+            should_prune = self.stats.sets % self.prune_every == 0
+        if should_prune:
+            self._prune()
+
+    def _prune(self) -> None:
+        from ..models import SearchCacheEntry
+
+        try:
+            stale = list(
+                SearchCacheEntry.objects.order_by("-created_at")
+                .values_list("key", flat=True)[self.max_entries:self.max_entries + 10_000]
+            )
+            if stale:
+                deleted, _ = SearchCacheEntry.objects.filter(key__in=stale).delete()
+                self.stats.evictions += deleted
+        except Exception:
+            self.stats.errors += 1
+
+    def invalidate_video(self, video_id: int) -> None:
+        from ..models import SearchCacheEntry
+
+        try:
+            deleted, _ = SearchCacheEntry.objects.filter(video_id=video_id).delete()
+            self.stats.evictions += deleted
+        except Exception:
+            self.stats.errors += 1
+
+    def size(self) -> int:
+        from ..models import SearchCacheEntry
+
+        try:
+            return SearchCacheEntry.objects.count()
+        except Exception:
+            return 0
+
+
+def get_search_cache():
+    """
+    Process-wide search result cache selected by SEARCH_CACHE_BACKEND:
+    memory (default), postgres/db, or none.
+    """
+    global _cache_backend
+    if _cache_backend is not None:
+        return _cache_backend
+    with _cache_lock:
+        if _cache_backend is not None:
+            return _cache_backend
+        backend = os.getenv("SEARCH_CACHE_BACKEND", "memory").lower()
+        if backend in ("postgres", "db", "database"):
+            _cache_backend = DatabaseCache(int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "100000")))
+        elif backend in ("none", "off", "false"):
+            _cache_backend = NullCache()
+        else:
+            _cache_backend = LRUCache(int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024")))
+    return _cache_backend
+
+
+def cache_stats() -> Dict:
+    cache = get_search_cache()
+    return {"backend": cache.name, "size": cache.size(), **cache.stats.as_dict()}
+
+
+# Exported on /metrics straight from the active backend's counters
+for _field in ("hits", "misses", "sets", "evictions", "errors"):
+    REGISTRY.callback(
+        f"scenequery_search_cache_{_field}_total",
+        f"Search result cache {_field}",
+        "counter",
+        lambda f=_field: getattr(get_search_cache().stats, f),
+    )
+REGISTRY.callback("scenequery_search_cache_entries", "Entries in the search result cache", "gauge", lambda: get_search_cache().size())
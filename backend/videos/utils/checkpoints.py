@@ -0,0 +1,109 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+
+def chain_fingerprints(stages: Sequence[str], configs: Dict[str, Dict]) -> Dict[str, str]:
+    """
+    Cumulative fingerprint per stage: each stage's key covers its own config and
+    every earlier stage's, so changing e.g. the Whisper settings invalidates
+    transcribe and everything after it, while an embedding model change keeps
+    the audio/transcribe/chunk artifacts.
+    """
+    out: Dict[str, str] = {}
+    prev = ""
+    for stage in stages:
+        raw = prev + "|" + stage + "|" + json.dumps(configs.get(stage, {}), sort_keys=True, default=str)
+        prev = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+        out[stage] = prev
+    return out
+
+
+class CheckpointStore:
+    """
+    Durable per-video stage artifacts under <root>/<video_id>/, named
+    <stage>-<fingerprint>.<ext>. Writes are atomic (temp file + os.replace), so a
+    crash never leaves a half-written artifact that a retry would trust.
+    """
+
+    def __init__(self, root: str | Path, video_id: int, fingerprints: Dict[str, str]):
+        self.dir = Path(root) / str(video_id)
+        self.fingerprints = fingerprints
+
+    def path(self, stage: str, ext: str) -> Path:
+        return self.dir / f"{stage}-{self.fingerprints[stage]}.{ext}"
+
+    def has(self, stage: str, ext: str) -> bool:
+        return self.path(stage, ext).exists()
+
+    def _prune(self, stage: str, keep: Path) -> None:
+        # Artifacts of the same stage under an older config are dead weight
+        for p in self.dir.glob(f"{stage}-*"):
+            if p != keep and not p.name.endswith(".tmp"):
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
+
+    def _atomic_write(self, stage: str, ext: str, write) -> Path:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        final = self.path(stage, ext)
+        fd, tmp = tempfile.mkstemp(dir=self.dir, prefix=f".{stage}-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, final)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        self._prune(stage, final)
+        return final
+
+    def save_json(self, stage: str, data: Any) -> Path:
+        return self._atomic_write(stage, "json", lambda f: f.write(json.dumps(data).encode("utf-8")))
+
+    def load_json(self, stage: str) -> Any:
+        with open(self.path(stage, "json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_array(self, stage: str, arr: np.ndarray) -> Path:
+        return self._atomic_write(stage, "npy", lambda f: np.save(f, arr, allow_pickle=False))
+
+    def load_array(self, stage: str) -> np.ndarray:
+        return np.load(self.path(stage, "npy"), allow_pickle=False)
+
+    def temp_path(self, stage: str, ext: str) -> Path:
+        """Scratch path in the artifact directory for tools that write files themselves (ffmpeg)."""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        return self.dir / f".{stage}-{self.fingerprints[stage]}.{ext}.tmp"
+
+    def commit_file(self, stage: str, ext: str, tmp: str | Path) -> Path:
+        with open(tmp, "rb") as f:
+            os.fsync(f.fileno())
+        final = self.path(stage, ext)
+        os.replace(tmp, final)
+        self._prune(stage, final)
+        return final
+
+    def invalidate(self, stages: List[str]) -> None:
+        for stage in stages:
+            for p in self.dir.glob(f"{stage}-*"):
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
+
+    def clear(self) -> None:
+        shutil.rmtree(self.dir, ignore_errors=True)
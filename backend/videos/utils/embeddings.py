@@ -1,36 +1,71 @@
 from __future__ import annotations
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional
 from sentence_transformers import SentenceTransformer
 
+from .metrics import counter, histogram
+from .scheduler import apply_torch_threads, get_core_budget
+
 _model_cache = None
+# Explicitly named models (embedding sets other than the configured default)
+_named_model_cache: Dict[str, SentenceTransformer] = {}
+_named_model_lock = threading.Lock()
+# Recent query vectors, so retyped or backspaced queries skip the model
+_query_cache: "OrderedDict[tuple[str, str], List[float]]" = OrderedDict()
+_query_lock = threading.Lock()
+
+MODEL_LOAD_SECONDS = histogram("scenequery_model_load_seconds", "Time to load a model into memory", ["model"])
+QUERY_CACHE_LOOKUPS = counter("scenequery_query_embedding_cache_total", "Query embedding cache lookups", ["result"])
+
+
+def _load(spec: str, is_path: bool, allow_downloads: bool, cache_dir: Optional[str], device: Optional[str]):
+    if is_path:
+        return SentenceTransformer(spec, cache_folder=cache_dir, device=device)
+    if not allow_downloads:
+        raise RuntimeError(
+            "Embedding model not available locally and downloads are disabled. "
+            "Set EMBED_MODEL_PATH or set ALLOW_MODEL_DOWNLOADS=true."
+        )
+    return SentenceTransformer(spec, cache_folder=cache_dir, device=device)
 
 
-def get_model():
+def get_model(model_name: Optional[str] = None):
+    """
+    Load (once per process) the configured embedding model, or a specific model
+    when model_name (a hub name or local directory) is given.
+    """
     global _model_cache
-    if _model_cache is not None:
+    if model_name is None and _model_cache is not None:
         return _model_cache
+    if model_name is not None and model_name in _named_model_cache:
+        return _named_model_cache[model_name]
 
     # Controls
-    local_path = os.getenv("EMBED_MODEL_PATH")
-    model_name = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    local_path = os.getenv("EMBED_MODEL_PATH") if model_name is None else None
+    if model_name is None:
+        model_name = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+        named = False
+    else:
+        named = True
     allow_downloads = os.getenv("ALLOW_MODEL_DOWNLOADS", "true").lower() != "false"
     cache_dir = os.getenv("EMBED_CACHE_DIR") or os.getenv("MODEL_CACHE_DIR")
     device = os.getenv("EMBED_DEVICE")  # e.g., "cuda" or "cpu"; None = auto
     if cache_dir:
         Path(cache_dir).mkdir(parents=True, exist_ok=True)
 
+    apply_torch_threads()
+    t0 = time.perf_counter()
     try:
         if local_path and os.path.isdir(local_path):
-            _model_cache = SentenceTransformer(local_path, cache_folder=cache_dir, device=device)
+            model = _load(local_path, True, allow_downloads, cache_dir, device)
         else:
-            if not allow_downloads:
-                raise RuntimeError(
-                    "Embedding model not available locally and downloads are disabled. "
-                    "Set EMBED_MODEL_PATH or set ALLOW_MODEL_DOWNLOADS=true."
-                )
-            _model_cache = SentenceTransformer(model_name, cache_folder=cache_dir, device=device)
+            model = _load(model_name, os.path.isdir(model_name), allow_downloads, cache_dir, device)
+        MODEL_LOAD_SECONDS.labels(model=f"embed:{model_name}").observe(time.perf_counter() - t0)
     except Exception as e:
         raise RuntimeError(
             "Failed to load embedding model. "
@@ -38,15 +73,60 @@ def get_model():
             + ("Downloads are disabled. " if not allow_downloads else "")
             + f"Original error: {e}"
         )
+    if named:
+        with _named_model_lock:
+            return _named_model_cache.setdefault(model_name, model)
+    _model_cache = model
     return _model_cache
 
 
-def embed_texts(texts: List[str]) -> List[List[float]]:
-    model = get_model()
-    batch_size = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+def model_fingerprint(model_name: Optional[str] = None) -> str:
+    """
+    Short stable identifier of an embedding model (the configured one by default).
+    Does not load the model, so it is cheap enough to compute on every search request.
+    """
+    if model_name is None:
+        local_path = os.getenv("EMBED_MODEL_PATH")
+        model_name = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+        if local_path and os.path.isdir(local_path):
+            model_name = local_path
+    spec = f"path:{model_name}" if os.path.isdir(model_name) else f"name:{model_name}"
+    return hashlib.sha1(f"{spec}|normalized".encode("utf-8")).hexdigest()[:12]
+
+
+def embed_texts(texts: List[str], model_name: Optional[str] = None, batch_size: Optional[int] = None) -> List[List[float]]:
+    model = get_model(model_name)
+    if batch_size is None:
+        batch_size = int(os.getenv("EMBED_BATCH_SIZE", "32"))
     vecs = model.encode(texts, normalize_embeddings=True, batch_size=batch_size, show_progress_bar=False)
     return [v.tolist() for v in vecs]
 
 
-def embed_text(text: str) -> List[float]:
-    return embed_texts([text])[0]
+def embed_text(text: str, model_name: Optional[str] = None) -> List[float]:
+    return embed_texts([text], model_name=model_name)[0]
+
+
+def embed_query(text: str, model_name: Optional[str] = None) -> List[float]:
+    """
+    embed_text() for interactive requests, run within the reserved interactive
+    cores. Vectors are kept in a per-process LRU of QUERY_EMBED_CACHE_SIZE entries
+    keyed by model and whitespace-normalized text; treat the result as read-only.
+    """
+    text = " ".join(text.split())
+    key = (model_name or "", text)
+    with _query_lock:
+        vec = _query_cache.get(key)
+        if vec is not None:
+            _query_cache.move_to_end(key)
+            QUERY_CACHE_LOOKUPS.labels(result="hit").inc()
+            return vec
+    QUERY_CACHE_LOOKUPS.labels(result="miss").inc()
+    with get_core_budget().interactive():
+        vec = embed_text(text, model_name=model_name)
+    size = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "2048"))
+    if size > 0:
+        with _query_lock:
+            _query_cache[key] = vec
+            while len(_query_cache) > size:
+                _query_cache.popitem(last=False)
+    return vec
@@ -48,3 +48,29 @@ def generate_frame(file_path: str | Path, out_path: str | Path, ts_seconds: floa
         raise RuntimeError(f"ffmpeg not found. Set FFMPEG_PATH in .env or add ffmpeg to PATH. Original error: {e}")
     if res.returncode != 0:
         raise RuntimeError(f"ffmpeg frame extraction failed: {res.stderr}")
+
+
+def extract_audio(file_path: str | Path, out_path: str | Path, sample_rate: int = 16000) -> None:
+    """
+    Decode the audio track to mono PCM WAV at Whisper's native sample rate, so
+    transcription (and any re-run of it) skips demuxing/resampling the video.
+    """
+    out = Path(out_path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    cmd = [
+        FFMPEG,
+        "-y",
+        "-i", str(file_path),
+        "-vn",
+        "-ac", "1",
+        "-ar", str(sample_rate),
+        "-c:a", "pcm_s16le",
+        "-f", "wav",
+        str(out),
+    ]
+    try:
+        res = subprocess.run(cmd, capture_output=True, text=True)
+    except FileNotFoundError as e:
+        raise RuntimeError(f"ffmpeg not found. Set FFMPEG_PATH in .env or add ffmpeg to PATH. Original error: {e}")
+    if res.returncode != 0:
+        raise RuntimeError(f"ffmpeg audio extraction failed: {res.stderr}")
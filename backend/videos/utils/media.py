@@ -0,0 +1,134 @@
+from __future__ import annotations
+import os
+from typing import Iterator, List, Optional, Tuple
+
+# A client asking for more ranges than this gets the whole file instead (RFC 9110 allows
+# ignoring Range); it keeps multipart responses from being abused to amplify work.
+MAX_RANGES = 16
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+def parse_byte_ranges(header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parse an HTTP Range header into a sorted list of inclusive (start, end) byte ranges.
+    Returns None when the header should be ignored (missing, malformed, not bytes,
+    too many ranges) and [] when none of the ranges is satisfiable.
+    Overlapping or adjacent ranges are coalesced.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+    ranges: List[Tuple[int, int]] = []
+    parts = [p.strip() for p in spec.split(",") if p.strip()]
+    if not parts or len(parts) > MAX_RANGES:
+        return None
+    for part in parts:
+        first, sep, last = part.partition("-")
+        if not sep:
+            return None
+        try:
+            if first == "":
+                # Suffix range: last N bytes
+                n = int(last)
+                if n < 0:
+                    return None
+                if n == 0 or size == 0:
+                    continue
+                ranges.append((max(0, size - n), size - 1))
+                continue
+            start = int(first)
+            end = int(last) if last else None
+        except ValueError:
+            return None
+        if start < 0 or (end is not None and end < start):
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, size - 1 if end is None else min(end, size - 1)))
+
+    ranges.sort()
+    merged: List[Tuple[int, int]] = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def file_etag(st: os.stat_result) -> str:
+    """Strong validator derived from size and mtime; usable with If-Range."""
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+class RangeFile:
+    """
+    File-like view of [start, start + length) of an open file.
+
+    It deliberately exposes fileno() but not seek()/tell(): WSGI servers that
+    implement wsgi.file_wrapper with os.sendfile (e.g. gunicorn) send
+    Content-Length bytes from the current offset, so a single range is still
+    served zero-copy, while the read() fallback never runs past the range.
+    """
+
+    def __init__(self, f, start: int, length: int):
+        self._f = f
+        self._remaining = length
+        f.seek(start)
+
+    def read(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._f.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self) -> int:
+        return self._f.fileno()
+
+    def close(self) -> None:
+        self._f.close()
+
+
+def multipart_byteranges(
+    path: str,
+    ranges: List[Tuple[int, int]],
+    size: int,
+    content_type: str,
+    boundary: str,
+) -> Tuple[Iterator[bytes], int]:
+    """
+    Build a multipart/byteranges body for several ranges.
+    Returns (chunk iterator, exact content length).
+    """
+    heads = [
+        (
+            f"--{boundary}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        ).encode("ascii")
+        for start, end in ranges
+    ]
+    tail = f"--{boundary}--\r\n".encode("ascii")
+    length = sum(len(h) + (end - start + 1) + 2 for h, (start, end) in zip(heads, ranges)) + len(tail)
+
+    def _iter() -> Iterator[bytes]:
+        with open(path, "rb") as f:
+            for head, (start, end) in zip(heads, ranges):
+                yield head
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    data = f.read(min(STREAM_BLOCK_SIZE, remaining))
+                    if not data:
+                        break
+                    remaining -= len(data)
+                    yield data
+                yield b"\r\n"
+        yield tail
+
+    return _iter(), length
@@ -0,0 +1,292 @@
+from __future__ import annotations
+import json
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; spans search phases (ms) up to whole transcriptions (minutes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    if v == -math.inf:
+        return "-Inf"
+    if float(v).is_integer() and abs(v) < 1e15:
+        return str(int(v))
+    return repr(float(v))
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric(ABC):
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values, **kv):
+        if kv:
+            values = tuple(str(kv[n]) for n in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _default(self):
+        # Unlabelled metrics act as their own single child
+        return self.labels()
+
+    @abstractmethod
+    def _new_child(self):
+        ...
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        ...
+
+    def render(self) -> str:
+        head = f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.type}\n"
+        return head + "".join(line + "\n" for line in self.samples())
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float) -> None:
+        self.value = float(value)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(c.value)}" for k, c in sorted(self._children.items())]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    self.counts[i] += 1
+                    break
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def samples(self) -> List[str]:
+        out: List[str] = []
+        for key, h in sorted(self._children.items()):
+            with h._lock:
+                counts, total, n = list(h.counts), h.sum, h.count
+            acc = 0
+            for b, c in zip(self.buckets, counts):
+                acc += c
+                le = 'le="%s"' % _fmt(b)
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {acc}")
+            le = 'le="+Inf"'
+            out.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {n}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(total)}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return out
+
+
+class CallbackMetric(_Metric):
+    """Value read at scrape time, e.g. counters that another component already keeps."""
+
+    def __init__(self, name: str, help: str, type: str, fn: Callable[[], float]):
+        super().__init__(name, help)
+        self.type = type
+        self.fn = fn
+
+    def _new_child(self):
+        raise TypeError(f"{self.name} is read from a callback and has no children")
+
+    def samples(self) -> List[str]:
+        try:
+            return [f"{self.name} {_fmt(float(self.fn()))}"]
+        except Exception:
+            return []
+
+
+class Registry:
+    """In-process metric registry rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(m, cls):
+                raise ValueError(f"metric {name} already registered as {m.type}")
+            return m
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def callback(self, name: str, help: str, type: str, fn: Callable[[], float]) -> CallbackMetric:
+        return self._get_or_create(CallbackMetric, name, help, type, fn)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(m.render() for m in metrics)
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+class JobTrace:
+    """
+    Structured timing trace of one job (e.g. processing a video): a list of named
+    spans with offsets, durations and metadata. When a histogram is given, every
+    span is also observed under its `stage` label.
+    """
+
+    def __init__(self, job: str, job_id, histogram: Optional[Histogram] = None):
+        self.job = job
+        self.job_id = job_id
+        self.histogram = histogram
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.spans: List[Dict] = []
+        self.status = "running"
+        self.error: Optional[str] = None
+
+    @contextmanager
+    def span(self, name: str, **meta) -> Iterator[Dict]:
+        rec = {"stage": name, "offset_sec": round(time.perf_counter() - self._t0, 6), **meta}
+        t0 = time.perf_counter()
+        try:
+            yield rec
+            rec.setdefault("status", "ok")
+        except BaseException:
+            rec["status"] = "error"
+            raise
+        finally:
+            rec["duration_sec"] = round(time.perf_counter() - t0, 6)
+            self.spans.append(rec)
+            if self.histogram is not None and rec["status"] == "ok":
+                self.histogram.labels(stage=name).observe(rec["duration_sec"])
+
+    def skip(self, name: str, reason: str = "checkpoint") -> None:
+        self.spans.append({
+            "stage": name,
+            "offset_sec": round(time.perf_counter() - self._t0, 6),
+            "duration_sec": 0.0,
+            "status": "skipped",
+            "reason": reason,
+        })
+
+    def finish(self, status: str, error: Optional[str] = None) -> Dict:
+        self.status = status
+        self.error = error
+        return self.as_dict()
+
+    def as_dict(self) -> Dict:
+        d = {
+            "job": self.job,
+            "id": self.job_id,
+            "status": self.status,
+            "started_at": self.started_at,
+            "total_sec": round(time.perf_counter() - self._t0, 6),
+            "spans": self.spans,
+        }
+        if self.error:
+            d["error"] = self.error
+        return d
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self.as_dict(), indent=2), encoding="utf-8")
+        os.replace(tmp, path)
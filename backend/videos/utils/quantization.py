@@ -0,0 +1,120 @@
+from __future__ import annotations
+from typing import Optional
+
+import numpy as np
+
+SCHEMES = ("int8", "binary", "binary+int8")
+
+# Bit count of every byte value, for Hamming distance over packed sign codes
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+# Rows scored per block, so int8 -> float32 widening never materializes the whole matrix
+_BLOCK_ROWS = 8192
+
+
+class QuantizedCodes:
+    """
+    Compressed copy of a (n, dim) float32 embedding matrix.
+      - int8: per-dimension affine scalar quantization, x ~= offset + scale * (code + 128)
+      - binary: 1 bit per dimension (sign), packed 8 dims per byte
+    """
+
+    def __init__(
+        self,
+        segment_ids: np.ndarray,
+        dim: int,
+        int8_codes: Optional[np.ndarray] = None,
+        int8_scale: Optional[np.ndarray] = None,
+        int8_offset: Optional[np.ndarray] = None,
+        sign_bits: Optional[np.ndarray] = None,
+    ):
+        self.segment_ids = segment_ids
+        self.dim = dim
+        self.int8_codes = int8_codes
+        self.int8_scale = int8_scale
+        self.int8_offset = int8_offset
+        self.sign_bits = sign_bits
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.segment_ids, self.int8_codes, self.int8_scale, self.int8_offset, self.sign_bits)
+        return sum(a.nbytes for a in arrays if a is not None)
+
+
+def quantize(matrix: np.ndarray, segment_ids: np.ndarray, scheme: str) -> QuantizedCodes:
+    if scheme not in SCHEMES:
+        raise ValueError(f"unknown quantization scheme: {scheme}")
+    matrix = np.asarray(matrix, dtype=np.float32)
+    n, dim = matrix.shape if matrix.ndim == 2 else (0, 0)
+    codes = QuantizedCodes(np.asarray(segment_ids, dtype=np.int64), dim)
+    if n == 0:
+        return codes
+    if "int8" in scheme:
+        lo = matrix.min(axis=0)
+        hi = matrix.max(axis=0)
+        scale = (hi - lo) / 255.0
+        scale[scale == 0] = 1.0
+        q = np.rint((matrix - lo) / scale) - 128
+        codes.int8_codes = np.clip(q, -128, 127).astype(np.int8)
+        codes.int8_scale = scale.astype(np.float32)
+        codes.int8_offset = lo.astype(np.float32)
+    if "binary" in scheme:
+        codes.sign_bits = np.packbits(matrix > 0, axis=1)
+    return codes
+
+
+def int8_scores(codes: QuantizedCodes, qvec: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """Approximate dot products q.x for all rows (or the given row indices) from int8 codes."""
+    qs = qvec * codes.int8_scale
+    const = float(qvec @ codes.int8_offset) + 128.0 * float(qs.sum())
+    mat = codes.int8_codes if rows is None else codes.int8_codes[rows]
+    out = np.empty(mat.shape[0], dtype=np.float32)
+    for i in range(0, mat.shape[0], _BLOCK_ROWS):
+        out[i:i + _BLOCK_ROWS] = mat[i:i + _BLOCK_ROWS].astype(np.float32) @ qs
+    return out + const
+
+
+def hamming_scores(codes: QuantizedCodes, qvec: np.ndarray) -> np.ndarray:
+    """Similarity from sign codes: number of agreeing signs (dim - Hamming distance)."""
+    qbits = np.packbits(qvec > 0)
+    dist = _POPCOUNT[np.bitwise_xor(codes.sign_bits, qbits)].sum(axis=1, dtype=np.int32)
+    return (codes.dim - dist).astype(np.float32)
+
+
+def _top(scores: np.ndarray, n: int) -> np.ndarray:
+    if n >= scores.shape[0]:
+        return np.argsort(-scores, kind="stable")
+    idx = np.argpartition(-scores, n - 1)[:n]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def candidates(codes: QuantizedCodes, qvec, scheme: str, n: int) -> np.ndarray:
+    """
+    First pass over the quantized codes. Returns up to n segment ids, best first,
+    to be rescored with exact float vectors.
+    """
+    if codes.segment_ids.shape[0] == 0:
+        return codes.segment_ids
+    q = np.asarray(qvec, dtype=np.float32)
+    if scheme == "int8":
+        rows = _top(int8_scores(codes, q), n)
+    elif scheme == "binary":
+        rows = _top(hamming_scores(codes, q), n)
+    elif scheme == "binary+int8":
+        # Cheap Hamming prefilter, then int8 refinement of a wider shortlist
+        wide = _top(hamming_scores(codes, q), n * 4)
+        rows = wide[_top(int8_scores(codes, q, wide), n)]
+    else:
+        raise ValueError(f"unknown quantization scheme: {scheme}")
+    return codes.segment_ids[rows]
+
+
+def bytes_per_segment(dim: int, scheme: str) -> float:
+    """Resident bytes per segment for a scheme, including the int64 segment id."""
+    if scheme == "float32":
+        return dim * 4 + 8
+    size = 8.0
+    if "int8" in scheme:
+        size += dim
+    if "binary" in scheme:
+        size += (dim + 7) // 8
+    return size
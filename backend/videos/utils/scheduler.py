@@ -0,0 +1,147 @@
+from __future__ import annotations
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from .metrics import REGISTRY
+
+_budget = None
+_budget_lock = threading.Lock()
+_torch_threads_applied = False
+
+
+class IngestQueueFull(Exception):
+    """Every ingest slot is busy and the wait queue is full; retry after retry_after seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"ingest queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+class CoreBudget:
+    """
+    Owns this process's CPU cores. A slice is reserved for interactive work
+    (query embedding for search/chat), and the rest is split evenly between at
+    most max_jobs concurrent ingest jobs. Each job gets threads_per_job threads
+    for Whisper and for embedding, so concurrent uploads never oversubscribe
+    the machine. Jobs beyond max_jobs wait in a bounded queue. Once that queue
+    is full, new jobs are refused (IngestQueueFull) instead of piling up.
+    """
+
+    def __init__(self, total: int, interactive: int, max_jobs: int, queue_limit: int):
+        self.total = max(1, total)
+        self.interactive_cores = min(max(0, interactive), self.total - 1)
+        self.ingest_cores = self.total - self.interactive_cores
+        self.max_jobs = max(1, min(max_jobs, self.ingest_cores))
+        self.threads_per_job = max(1, self.ingest_cores // self.max_jobs)
+        self.queue_limit = max(0, queue_limit)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._cond = threading.Condition()
+        self._avg_job_sec: Optional[float] = None
+        self._interactive = threading.BoundedSemaphore(max(1, self.interactive_cores))
+
+    @classmethod
+    def from_env(cls) -> "CoreBudget":
+        total = int(os.getenv("CPU_CORE_BUDGET", "0") or 0) or available_cores()
+        interactive = int(os.getenv("INTERACTIVE_RESERVED_CORES", str(max(1, total // 4))))
+        ingest = max(1, total - interactive)
+        # ~4 threads per transcription is where Whisper on CPU stops scaling well
+        max_jobs = int(os.getenv("INGEST_MAX_CONCURRENCY", "0") or 0) or max(1, ingest // 4)
+        queue_limit = int(os.getenv("INGEST_QUEUE_LIMIT", "4"))
+        return cls(total, interactive, max_jobs, queue_limit)
+
+    def retry_after(self) -> int:
+        """Seconds until a queue position is likely to free up, from the running average job time."""
+        avg = self._avg_job_sec if self._avg_job_sec is not None else 30.0
+        return int(min(600, max(1, math.ceil(avg * (self.waiting + 1) / self.max_jobs))))
+
+    @contextmanager
+    def ingest_slot(self) -> Iterator[int]:
+        """
+        Hold one ingest slot for the duration of the block, waiting in the queue if
+        all are busy. Yields the job's thread allotment. Raises IngestQueueFull
+        when the queue is already at INGEST_QUEUE_LIMIT.
+        """
+        with self._cond:
+            if self.active >= self.max_jobs and self.waiting >= self.queue_limit:
+                self.rejected += 1
+                raise IngestQueueFull(self.retry_after())
+            self.waiting += 1
+            try:
+                while self.active >= self.max_jobs:
+                    self._cond.wait()
+            finally:
+                self.waiting -= 1
+            self.active += 1
+        t0 = time.monotonic()
+        try:
+            yield self.threads_per_job
+        finally:
+            elapsed = time.monotonic() - t0
+            with self._cond:
+                self.active -= 1
+                self._avg_job_sec = elapsed if self._avg_job_sec is None else 0.8 * self._avg_job_sec + 0.2 * elapsed
+                self._cond.notify()
+
+    @contextmanager
+    def interactive(self) -> Iterator[None]:
+        """Bound concurrent interactive model calls to the reserved cores."""
+        with self._interactive:
+            yield
+
+    def as_dict(self) -> Dict:
+        return {
+            "total_cores": self.total,
+            "interactive_cores": self.interactive_cores,
+            "ingest_cores": self.ingest_cores,
+            "max_jobs": self.max_jobs,
+            "threads_per_job": self.threads_per_job,
+            "queue_limit": self.queue_limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "avg_job_sec": round(self._avg_job_sec, 3) if self._avg_job_sec is not None else None,
+        }
+
+
+def get_core_budget() -> CoreBudget:
+    global _budget
+    if _budget is None:
+        with _budget_lock:
+            if _budget is None:
+                _budget = CoreBudget.from_env()
+    return _budget
+
+
+def apply_torch_threads() -> None:
+    """
+    Cap torch's intra-op pool (used by sentence-transformers on CPU) at one job's
+    allotment, once per process. EMBED_TORCH_THREADS overrides it.
+    """
+    global _torch_threads_applied
+    if _torch_threads_applied:
+        return
+    _torch_threads_applied = True
+    try:
+        import torch
+
+        torch.set_num_threads(int(os.getenv("EMBED_TORCH_THREADS", "0") or 0) or get_core_budget().threads_per_job)
+    except Exception as e:
+        print(f"[videos] Could not set torch threads: {e}")
+
+
+REGISTRY.callback("scenequery_ingest_active_jobs", "Ingest jobs holding a core allotment", "gauge", lambda: get_core_budget().active)
+REGISTRY.callback("scenequery_ingest_waiting_jobs", "Ingest jobs queued for a core allotment", "gauge", lambda: get_core_budget().waiting)
+REGISTRY.callback("scenequery_ingest_rejected_total", "Ingest jobs refused with 429 (queue full)", "counter", lambda: get_core_budget().rejected)
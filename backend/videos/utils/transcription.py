@@ -1,10 +1,25 @@
 from __future__ import annotations
+import inspect
 import os
+import time
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 from faster_whisper import WhisperModel
 
+try:
+    from faster_whisper import BatchedInferencePipeline  # faster-whisper >= 1.1
+except ImportError:  # pragma: no cover
+    BatchedInferencePipeline = None  # type: ignore
+
+from .metrics import histogram
+from .scheduler import get_core_budget
+
+MODEL_LOAD_SECONDS = histogram("scenequery_model_load_seconds", "Time to load a model into memory", ["model"])
 
 _whisper_cache: WhisperModel | None = None
+_batched_cache = None
+_batched_warned = False
+_vad_warned = False
 
 
 def get_whisper_model(model_size: str = "small") -> WhisperModel:
@@ -24,11 +39,14 @@ def get_whisper_model(model_size: str = "small") -> WhisperModel:
     device = os.getenv("WHISPER_DEVICE", "cpu")  # cpu | cuda | auto
     compute_type = os.getenv("WHISPER_COMPUTE_TYPE", "float32")  # e.g., float16, int8_float16, int8
     # Parallelism controls (CPU)
-    # Do not pass None here; ctranslate2's underlying Whisper binding expects an int
-    # 0 lets the runtime choose a default number of threads
-    cpu_threads = int(os.getenv("WHISPER_CPU_THREADS", "0") or 0)
-    num_workers = int(os.getenv("WHISPER_NUM_WORKERS", "1") or 1)
+    # Do not pass None here; ctranslate2's underlying Whisper binding expects an int.
+    # By default each concurrent transcription gets one job's share of the core
+    # budget, and there are as many workers as ingest slots.
+    budget = get_core_budget()
+    cpu_threads = int(os.getenv("WHISPER_CPU_THREADS", "0") or 0) or budget.threads_per_job
+    num_workers = int(os.getenv("WHISPER_NUM_WORKERS", "0") or 0) or budget.max_jobs
 
+    t0 = time.perf_counter()
     try:
         _whisper_cache = WhisperModel(
             model_spec,
@@ -39,6 +57,7 @@ def get_whisper_model(model_size: str = "small") -> WhisperModel:
             cpu_threads=cpu_threads,
             num_workers=num_workers,
         )
+        MODEL_LOAD_SECONDS.labels(model=f"whisper:{model_spec}").observe(time.perf_counter() - t0)
     except Exception as e:
         dl_note = "Downloads are disabled (set ALLOW_MODEL_DOWNLOADS=true)" if not allow_downloads else ""
         raise RuntimeError(
@@ -50,28 +69,77 @@ def get_whisper_model(model_size: str = "small") -> WhisperModel:
     return _whisper_cache
 
 
-def transcribe(path: str, model_size: str = "small"):
+def transcription_options() -> Dict:
+    """Decoding options from the WHISPER_* environment (also used to fingerprint transcripts)."""
+    return {
+        "vad_filter": os.getenv("WHISPER_VAD_FILTER", "true").lower() != "false",
+        "beam_size": int(os.getenv("WHISPER_BEAM_SIZE", "1")),  # 1 is fastest greedy
+        "best_of": int(os.getenv("WHISPER_BEST_OF", "1")),
+        "condition_on_previous_text": os.getenv("WHISPER_CONDITION_ON_PREV", "false").lower() == "true",
+        "language": os.getenv("WHISPER_LANGUAGE") or None,  # set to 'en' to skip detection
+        "temperature": float(os.getenv("WHISPER_TEMPERATURE", "0")),
+    }
+
+
+def batched_enabled() -> bool:
+    """WHISPER_BATCHED: decode VAD speech regions in batches instead of one window at a time (forces VAD on)."""
+    return os.getenv("WHISPER_BATCHED", "false").lower() == "true"
+
+
+def whisper_batch_size() -> int:
+    return max(1, int(os.getenv("WHISPER_BATCH_SIZE", "8")))
+
+
+def _batched_pipeline(model):
+    """The batched pipeline for model, or None (with a one-time note) when faster-whisper is too old."""
+    global _batched_cache, _batched_warned
+    if BatchedInferencePipeline is None:
+        if not _batched_warned:
+            _batched_warned = True
+            print("[videos] WHISPER_BATCHED needs faster-whisper >= 1.1; transcribing sequentially")
+        return None
+    if _batched_cache is None or _batched_cache.model is not model:
+        _batched_cache = BatchedInferencePipeline(model=model)
+    return _batched_cache
+
+
+def transcribe(
+    path: str,
+    model_size: str = "small",
+    language: Optional[str] = None,
+    batched: Optional[bool] = None,
+    batch_size: Optional[int] = None,
+) -> Tuple[List[Dict], Dict]:
     """
-    Returns list of segments: [{"start": float, "end": float, "text": str}]
+    Returns (segments, info): segments as [{"start": float, "end": float, "text": str}],
+    info as {"language", "language_probability", "mode"}. WHISPER_LANGUAGE wins over
+    language; pass a previously detected language to skip detection. batched and
+    batch_size default to WHISPER_BATCHED and WHISPER_BATCH_SIZE.
     """
+    global _vad_warned
     model = get_whisper_model(model_size)
-    # Transcription tuning via env
-    vad_filter = os.getenv("WHISPER_VAD_FILTER", "true").lower() != "false"
-    beam_size = int(os.getenv("WHISPER_BEAM_SIZE", "1"))  # 1 is fastest greedy
-    best_of = int(os.getenv("WHISPER_BEST_OF", "1"))
-    cond_prev = os.getenv("WHISPER_CONDITION_ON_PREV", "false").lower() == "true"
-    language = os.getenv("WHISPER_LANGUAGE") or None  # set to 'en' to skip detection
-    temperature = float(os.getenv("WHISPER_TEMPERATURE", "0"))
-
-    segments, _ = model.transcribe(
-        path,
-        vad_filter=vad_filter,
-        beam_size=beam_size,
-        best_of=best_of,
-        condition_on_previous_text=cond_prev,
-        language=language,
-        temperature=temperature,
-    )
+    options = transcription_options()
+    if options["language"] is None and language:
+        options["language"] = language
+    pipeline = _batched_pipeline(model) if (batched_enabled() if batched is None else batched) else None
+    if pipeline is not None:
+        # The batched pipeline decodes VAD speech regions and raises on audio over 30 s without them
+        if not options["vad_filter"]:
+            if not _vad_warned:
+                _vad_warned = True
+                print("[videos] WHISPER_BATCHED needs VAD; ignoring WHISPER_VAD_FILTER=false")
+            options["vad_filter"] = True
+        # Only pass the options this faster-whisper's batched transcribe() accepts
+        accepted = inspect.signature(pipeline.transcribe).parameters
+        segments, info = pipeline.transcribe(
+            path,
+            batch_size=batch_size or whisper_batch_size(),
+            **{k: v for k, v in options.items() if k in accepted},
+        )
+        mode = "batched"
+    else:
+        segments, info = model.transcribe(path, **options)
+        mode = "sequential"
     out = []
     for seg in segments:
         out.append({
@@ -79,4 +147,8 @@ def transcribe(path: str, model_size: str = "small"):
             "end": float(seg.end),
             "text": seg.text.strip(),
         })
-    return out
+    return out, {
+        "language": info.language,
+        "language_probability": round(float(info.language_probability or 0.0), 4),
+        "mode": mode,
+    }
@@ -1,17 +1,76 @@
 from __future__ import annotations
+import json
+import mimetypes
 import os
+import secrets
 from pathlib import Path
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.views import View
 from rest_framework import status
 from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.views import APIView
 
 from .models import Video
 from .serializers import VideoSerializer
-from .services import process_video, search_video
+from .services import PIPELINE_STAGES, VIDEO_EXTENSIONS, cached_search_video, process_video, search_etag_key, trace_path
+from .transcripts import EXPORT_FORMATS, iter_export, parse_fields, transcript_page
+from .embedding_sets import active_fingerprint
+from .utils.cache import cache_stats
 from .utils.ffmpeg import get_duration_seconds
+from .utils.media import RangeFile, file_etag, multipart_byteranges, parse_byte_ranges
+from .utils.metrics import REGISTRY
+from .utils.scheduler import IngestQueueFull, get_core_budget
+
+
+def _queue_full(e: IngestQueueFull) -> JsonResponse:
+    resp = JsonResponse({"detail": str(e), "retry_after": e.retry_after}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    resp["Retry-After"] = str(e.retry_after)
+    return resp
+
+
+def _etag_matches(request, etag: str) -> bool:
+    client_etags = [t.removeprefix("W/") for t in parse_etags(request.headers.get("If-None-Match", ""))]
+    return "*" in client_etags or etag in client_etags
+
+
+def _transcript_etag(video: Video, fields, *parts: str) -> str:
+    # Segments only change on re-index; embeddings also change with the active set
+    fingerprint = active_fingerprint() if "embedding" in fields else ""
+    return '"' + "-".join(["t", str(video.id), str(video.index_version), fingerprint, "+".join(fields), *parts]) + '"'
+
+
+def _in_thread(iterator):
+    """
+    Async view of a sync iterator, each step run in the request's sync thread.
+    Under ASGI, Django would otherwise read a sync streaming iterator into a list
+    first. The thread is the same one that opened any server-side cursor.
+    """
+    sentinel = object()
+    step = sync_to_async(lambda: next(iterator, sentinel), thread_sensitive=True)
+
+    async def agen():
+        try:
+            while True:
+                part = await step()
+                if part is sentinel:
+                    return
+                yield part
+        finally:
+            await sync_to_async(iterator.close, thread_sensitive=True)()
+
+    return agen()
 
 
 class VideoUploadView(APIView):
@@ -21,7 +80,7 @@ class VideoUploadView(APIView):
         f = request.FILES.get("file")
         if not f:
             return JsonResponse({"detail": "file is required"}, status=400)
-        if not f.name.lower().endswith((".mp4", ".mov", ".webm")):
+        if not f.name.lower().endswith(VIDEO_EXTENSIONS):
             return JsonResponse({"detail": "unsupported media type"}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
 
         # Ensure media root exists
@@ -30,6 +89,14 @@ class VideoUploadView(APIView):
         except Exception as e:
             return JsonResponse({"detail": f"Failed to prepare media directory: {e}"}, status=500)
 
+        # Admission control: wait for an ingest slot, or refuse before saving anything
+        try:
+            with get_core_budget().ingest_slot():
+                return self._ingest(f)
+        except IngestQueueFull as e:
+            return _queue_full(e)
+
+    def _ingest(self, f):
         # Save file first to determine duration
         try:
             video = Video.objects.create(title=os.path.splitext(f.name)[0], file=f, status="processing")
@@ -78,11 +145,48 @@ class VideoDetailView(APIView):
         return JsonResponse(ser.data)
 
 
+class VideoReprocessView(APIView):
+    def post(self, request, video_id: int):
+        """
+        Resume a failed/interrupted video from its checkpoints, or force a re-run
+        from a given stage with {"from_stage": "<stage>"}.
+        """
+        try:
+            video = Video.objects.get(id=video_id)
+        except Video.DoesNotExist:
+            return JsonResponse({"detail": "not found"}, status=404)
+        from_stage = request.data.get("from_stage") or None
+        if from_stage is not None and from_stage not in PIPELINE_STAGES:
+            return JsonResponse(
+                {"detail": f"from_stage must be one of: {', '.join(PIPELINE_STAGES)}"}, status=400
+            )
+        file_path = Path(settings.MEDIA_ROOT) / video.file.name
+        if not file_path.exists():
+            return JsonResponse({"detail": "source file is missing"}, status=409)
+
+        try:
+            with get_core_budget().ingest_slot():
+                process_video(video.id, file_path, from_stage=from_stage)
+        except IngestQueueFull as e:
+            return _queue_full(e)
+        except Exception as e:
+            return JsonResponse({"detail": f"processing failed: {e}"}, status=500)
+
+        video.refresh_from_db()
+        return JsonResponse(VideoSerializer(video).data)
+
+
 class VideoSearchView(APIView):
     def get(self, request, video_id: int):
         q = request.GET.get("q", "").strip()
         if not q:
             return JsonResponse({"detail": "q required"}, status=400)
+        try:
+            k = int(request.GET.get("k", "3"))
+        except ValueError:
+            return JsonResponse({"detail": "k must be an integer"}, status=400)
+        if not 1 <= k <= 50:
+            return JsonResponse({"detail": "k must be between 1 and 50"}, status=400)
         try:
             video = Video.objects.get(id=video_id)
         except Video.DoesNotExist:
@@ -90,16 +194,207 @@ class VideoSearchView(APIView):
         if video.status != "ready":
             return JsonResponse({"detail": f"video status is {video.status}"}, status=400)
 
+        # Results are deterministic for (video, index version, model, q, k), so the
+        # cache key is a valid strong ETag and revalidation needs no search at all.
+        etag = f'"{search_etag_key(video, q, k)}"'
+        cache_control = f"max-age={int(os.getenv('SEARCH_CACHE_MAX_AGE', '0'))}, must-revalidate"
+        if _etag_matches(request, etag):
+            resp = HttpResponseNotModified()
+            resp["ETag"] = etag
+            resp["Cache-Control"] = cache_control
+            return resp
+
         try:
-            data = search_video(video, q)
+            data, _, hit = cached_search_video(video, q, k)
         except ValueError as ve:
             return JsonResponse({"detail": str(ve)}, status=400)
         except Exception as e:
             return JsonResponse({"detail": f"search failed: {e}"}, status=500)
-        return JsonResponse(data)
+        resp = JsonResponse(data)
+        resp["ETag"] = etag
+        resp["Cache-Control"] = cache_control
+        resp["X-Cache"] = "HIT" if hit else "MISS"
+        return resp
+
+
+class VideoTranscriptView(APIView):
+    def get(self, request, video_id: int):
+        """
+        Keyset-paginated transcript segments in (start_sec, id) order. Pass back
+        next_cursor as ?cursor= for the next page. ?fields= selects columns
+        (id, start_sec, end_sec, text, embedding); embeddings are left out by default.
+        """
+        try:
+            limit = int(request.GET.get("limit", "100"))
+        except ValueError:
+            return JsonResponse({"detail": "limit must be an integer"}, status=400)
+        if not 1 <= limit <= 1000:
+            return JsonResponse({"detail": "limit must be between 1 and 1000"}, status=400)
+        try:
+            fields = parse_fields(request.GET.get("fields"))
+        except ValueError as ve:
+            return JsonResponse({"detail": str(ve)}, status=400)
+        try:
+            video = Video.objects.get(id=video_id)
+        except Video.DoesNotExist:
+            return JsonResponse({"detail": "not found"}, status=404)
+
+        cursor = request.GET.get("cursor") or None
+        etag = _transcript_etag(video, fields, str(limit), cursor or "")
+        if _etag_matches(request, etag):
+            resp = HttpResponseNotModified()
+            resp["ETag"] = etag
+            return resp
+        try:
+            segments, next_cursor = transcript_page(video.id, fields, limit, cursor)
+        except ValueError as ve:
+            return JsonResponse({"detail": str(ve)}, status=400)
+        resp = JsonResponse({"video": video.id, "segments": segments, "next_cursor": next_cursor})
+        resp["ETag"] = etag
+        return resp
+
+
+class VideoTranscriptExportView(View):
+    """
+    The whole transcript as NDJSON (honours ?fields=), WebVTT or SRT, streamed
+    from a server-side cursor so memory stays flat for multi-hour videos.
+    """
+
+    def get(self, request, video_id: int, fmt: str):
+        if fmt not in EXPORT_FORMATS:
+            raise Http404("unknown transcript format")
+        try:
+            fields = parse_fields(request.GET.get("fields"))
+        except ValueError as ve:
+            return JsonResponse({"detail": str(ve)}, status=400)
+        try:
+            video = Video.objects.get(id=video_id)
+        except Video.DoesNotExist:
+            return JsonResponse({"detail": "not found"}, status=404)
+
+        etag = _transcript_etag(video, fields if fmt == "ndjson" else (), fmt)
+        if _etag_matches(request, etag):
+            resp = HttpResponseNotModified()
+            resp["ETag"] = etag
+            return resp
+        chunks = (part.encode("utf-8") for part in iter_export(video.id, fmt, fields))
+        if isinstance(request, ASGIRequest):
+            chunks = _in_thread(chunks)
+        resp = StreamingHttpResponse(chunks, content_type=EXPORT_FORMATS[fmt])
+        resp["ETag"] = etag
+        resp["Content-Disposition"] = f'inline; filename="video-{video.id}.{fmt}"'
+        return resp
+
+
+class SearchCacheStatsView(APIView):
+    def get(self, request):
+        return JsonResponse(cache_stats())
+
+
+class VideoTraceView(APIView):
+    def get(self, request, video_id: int):
+        """Stage timing trace of the video's last processing run."""
+        path = trace_path(video_id)
+        if not path.exists():
+            return JsonResponse({"detail": "no trace recorded"}, status=404)
+        with open(path, "r", encoding="utf-8") as f:
+            return JsonResponse(json.load(f))
+
+
+class MetricsView(View):
+    """Prometheus text exposition of this process's metrics registry."""
+
+    def get(self, request):
+        return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 class ChatView(APIView):
     def post(self, request):
         # Placeholder for future RAG chat logic
         return JsonResponse({"answer": "Not implemented yet", "citations": []}, status=501)
+
+
+class MediaView(View):
+    """
+    Serves files under MEDIA_ROOT with HTTP Range support so the player can seek
+    without downloading whole videos.
+
+    Single ranges and full files go through FileResponse, which WSGI servers with
+    wsgi.file_wrapper send zero-copy (os.sendfile). Multiple ranges are streamed as
+    multipart/byteranges. With MEDIA_ACCEL_REDIRECT set, the response is handed
+    off to a fronting nginx via X-Accel-Redirect instead.
+    """
+
+    http_method_names = ["get", "head", "options"]
+
+    def get(self, request, path: str):
+        root = Path(settings.MEDIA_ROOT).resolve()
+        full_path = (root / path).resolve()
+        if not full_path.is_relative_to(root) or not full_path.is_file():
+            raise Http404("not found")
+        if full_path.is_relative_to(Path(settings.VECTOR_SHARD_DIR).resolve()):
+            raise Http404("not found")
+        st = full_path.stat()
+        size = st.st_size
+        etag = file_etag(st)
+        content_type = mimetypes.guess_type(full_path.name)[0] or "application/octet-stream"
+        if path.startswith("frames/"):
+            # Frame names encode video id and timestamp and are never rewritten
+            cache_control = "public, max-age=31536000, immutable"
+        else:
+            cache_control = f"public, max-age={int(os.getenv('MEDIA_MAX_AGE', '3600'))}"
+
+        def _headers(resp):
+            resp["ETag"] = etag
+            resp["Last-Modified"] = http_date(st.st_mtime)
+            resp["Accept-Ranges"] = "bytes"
+            resp["Cache-Control"] = cache_control
+            return resp
+
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            client_etags = [t.removeprefix("W/") for t in parse_etags(if_none_match)]
+            if "*" in client_etags or etag in client_etags:
+                return _headers(HttpResponseNotModified())
+        else:
+            since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+            if since is not None and int(st.st_mtime) <= since:
+                return _headers(HttpResponseNotModified())
+
+        accel_prefix = os.getenv("MEDIA_ACCEL_REDIRECT")
+        if accel_prefix:
+            resp = HttpResponse(content_type=content_type)
+            resp["X-Accel-Redirect"] = accel_prefix.rstrip("/") + "/" + full_path.relative_to(root).as_posix()
+            return _headers(resp)
+
+        ranges = parse_byte_ranges(request.headers.get("Range", ""), size)
+        if_range = request.headers.get("If-Range")
+        if ranges is not None and if_range:
+            # Only honour Range if the client's copy is still current
+            if if_range.startswith('"') or if_range.startswith("W/"):
+                current = if_range == etag
+            else:
+                since = parse_http_date_safe(if_range)
+                current = since is not None and int(st.st_mtime) <= since
+            if not current:
+                ranges = None
+
+        if ranges is None:
+            resp = FileResponse(open(full_path, "rb"), content_type=content_type)
+            return _headers(resp)
+        if not ranges:
+            resp = HttpResponse(status=416)
+            resp["Content-Range"] = f"bytes */{size}"
+            return _headers(resp)
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            resp = FileResponse(RangeFile(open(full_path, "rb"), start, end - start + 1), content_type=content_type, status=206)
+            resp["Content-Length"] = str(end - start + 1)
+            resp["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return _headers(resp)
+
+        boundary = secrets.token_hex(16)
+        body, length = multipart_byteranges(str(full_path), ranges, size, content_type, boundary)
+        resp = StreamingHttpResponse(body, status=206, content_type=f"multipart/byteranges; boundary={boundary}")
+        resp["Content-Length"] = str(length)
+        return _headers(resp)
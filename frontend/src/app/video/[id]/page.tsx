@@ -25,6 +25,9 @@ export default function VideoPage() {
   const [alts, setAlts] = useState<any[]>([]);
 
   const videoRef = useRef<HTMLVideoElement | null>(null);
+  const searchWsRef = useRef<WebSocket | null>(null);
+  const searchSeqRef = useRef(0);
+  const liveQueryRef = useRef("");
 
   type ChatMessage = { role: "system" | "user" | "assistant" | "error"; content: string };
   const [messages, setMessages] = useState<ChatMessage[]>([]);
@@ -62,8 +65,23 @@ export default function VideoPage() {
     };
   }, [id]);
 
+  const onQueryChange = (value: string) => {
+    setQ(value);
+    const ws = searchWsRef.current;
+    if (ws && ws.readyState === WebSocket.OPEN) {
+      searchSeqRef.current += 1;
+      ws.send(JSON.stringify({ type: "query", text: value, k: 3, seq: searchSeqRef.current }));
+    }
+  };
+
   const onSearch = async () => {
     if (!q.trim()) return;
+    // Live results for this exact query are already shown; only the frame is missing
+    const ws = searchWsRef.current;
+    if (ws && ws.readyState === WebSocket.OPEN && best?.segmentId !== undefined && liveQueryRef.current === q.trim()) {
+      ws.send(JSON.stringify({ type: "select", segmentId: best.segmentId }));
+      return;
+    }
     setSearching(true);
     setError(null);
     try {
@@ -91,6 +109,39 @@ export default function VideoPage() {
     }
   }
 
+  useEffect(() => {
+    if (!id || Number.isNaN(id)) return;
+    // Search-as-you-type; without it, the Search button falls back to HTTP
+    const ws = new WebSocket(`${toWsOrigin(API_BASE)}/ws/videos/${id}/search/`);
+    searchWsRef.current = ws;
+    ws.onmessage = (evt) => {
+      let msg: any;
+      try {
+        msg = JSON.parse(evt.data);
+      } catch {
+        return;
+      }
+      if (msg.type === "search_results" && msg.seq === searchSeqRef.current) {
+        liveQueryRef.current = msg.query;
+        setBest(msg.results[0] || null);
+        setAlts(msg.results.slice(1));
+      } else if (msg.type === "search_frame") {
+        setBest((prev: any) => ({ ...msg, score: prev?.segmentId === msg.segmentId ? prev.score : undefined }));
+        if (videoRef.current) {
+          videoRef.current.currentTime = msg.timestamp;
+          videoRef.current.play().catch(() => {});
+        }
+      }
+    };
+    ws.onclose = () => {
+      if (searchWsRef.current === ws) searchWsRef.current = null;
+    };
+    return () => {
+      try { ws.close(); } catch {}
+      searchWsRef.current = null;
+    };
+  }, [id]);
+
   useEffect(() => {
     if (!id || Number.isNaN(id)) return;
     const wsUrl = `${toWsOrigin(API_BASE)}/ws/videos/${id}/chat/`;
@@ -263,7 +314,8 @@ export default function VideoPage() {
       <div className="mt-6 flex gap-2">
         <input
           value={q}
-          onChange={(e) => setQ(e.target.value)}
+          onChange={(e) => onQueryChange(e.target.value)}
+          onKeyDown={(e) => { if (e.key === "Enter") onSearch(); }}
           placeholder="Ask a question about this video (e.g., pricing, features)"
           className="flex-1 border rounded px-3 py-2"
         />